@@ -0,0 +1,6 @@
+"""
+Offline benchmarks for character generation and our responses.  Run these
+from the root of the repo, e.g. `python -m benchmarks` to run every timing
+suite and write their results as JSON, or `python -m benchmarks.generation`
+for a single one.
+"""
@@ -0,0 +1,26 @@
+"""
+Runs our timing benchmarks and writes each suite's results to a JSON file in
+the given directory, e.g. `python -m benchmarks --output-dir results/1.0.0`.
+"""
+import os
+import argparse
+import importlib
+
+SUITES = ['generation', 'responses', 'parsing']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--output-dir', default='.')
+    parser.add_argument('--number', default='1000', help='calls per timing round')
+    args = parser.parse_args()
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    for suite in SUITES:
+        output = os.path.join(args.output_dir, f'{suite}.json')
+        importlib.import_module(f'benchmarks.{suite}').main(['--number', args.number, '--output', output])
+        print()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+"""
+Benchmarks the character generation hot path: constructing each character
+type, rendering and serializing them, weighted choices from our config, and
+picking unused names as the campaign fills up.  This runs entirely offline
+using development-defaults.ini.
+
+Usage:
+    python -m benchmarks.generation [--number 1000] [--output generation.json]
+"""
+import argparse
+
+from chargen import config, constants as c
+from chargen.character import Samurai, Peasant, Monk, weighted_choice, section_sampler, unused_name
+from benchmarks.timing import measure, report
+
+FILL_LEVELS = [0, 50, 90, 99]
+"""Percentages of our names which are already used for the unused_name() benchmarks."""
+
+
+def fill_used_names(percent: int):
+    """Marks the given percentage of each gender's names as used."""
+    c.USED_NAMES.clear()
+    for gender, names in c.NAMES.items():
+        c.USED_NAMES.update(list(names)[:len(names) * percent // 100])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--number', type=int, default=1000, help='calls per timing round')
+    parser.add_argument('--output', help='JSON file to write the results to')
+    args = parser.parse_args(argv)
+
+    samurai, peasant, monk = Samurai(5), Peasant(), Monk(5)
+    results = {
+        'Samurai(5)': measure(lambda: Samurai(5), args.number),
+        'Peasant()': measure(lambda: Peasant(), args.number),
+        'Monk(5)': measure(lambda: Monk(5), args.number),
+        'Samurai.to_dict()': measure(samurai.to_dict, args.number),
+        'Peasant.to_dict()': measure(peasant.to_dict, args.number),
+        'Monk.to_dict()': measure(monk.to_dict, args.number),
+        'Samurai.render(public_info.txt)': measure(lambda: samurai.render('public_info.txt'), args.number),
+        'Samurai.render(private_info.txt)': measure(lambda: samurai.render('private_info.txt'), args.number),
+        'weighted_choice(clans)': measure(lambda: weighted_choice(config['clans']), args.number),
+        'section_sampler(clans).choice()': measure(lambda: section_sampler('clans').choice(), args.number),
+        'weighted_choice(schools.lion)': measure(lambda: weighted_choice(config['schools']['lion']), args.number),
+        'section_sampler(schools, lion).choice()': measure(lambda: section_sampler('schools', 'lion').choice(), args.number),
+    }
+
+    used_names = set(c.USED_NAMES)
+    try:
+        for percent in FILL_LEVELS:
+            fill_used_names(percent)
+            results[f'unused_name() at {percent}% used'] = measure(unused_name, args.number)
+    finally:
+        c.USED_NAMES.clear()
+        c.USED_NAMES.update(used_names)
+
+    report('generation', results, args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+"""
+Benchmarks parsing the pages of our campaign's character listing with each
+parser op.parse_characters_page() can use (lxml with XPath if it's installed,
+and BeautifulSoup with a SoupStrainer so html.parser only builds the character
+cards) against the original scraper, which parsed every page in full with
+BeautifulSoup and html.parser.
+
+The listing pages in benchmarks/fixtures follow the markup of Obsidian
+Portal's listing (including the page chrome around it and the edge cases our
+scraper skips), so this runs entirely offline.  Before timing anything we
+check that every parser gets exactly the same characters and last page
+number from every fixture as the original scraper does.
+
+Usage:
+    python -m benchmarks.parsing [--number 1000] [--output parsing.json]
+"""
+import os
+import re
+import sys
+import argparse
+
+from bs4 import BeautifulSoup
+
+from chargen import op
+from benchmarks.timing import measure, report
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+
+def load_fixtures() -> dict:
+    """Returns the HTML of each listing page fixture, keyed by its page number."""
+    pages = {}
+    for filename in os.listdir(FIXTURES):
+        match = re.match(r'^characters-page-(\d+)\.html$', filename)
+        if match:
+            with open(os.path.join(FIXTURES, filename), encoding='utf-8') as f:
+                pages[int(match.group(1))] = f.read()
+    return dict(sorted(pages.items()))
+
+
+def original_parse(html: str, page: int):
+    """How _scrape_characters_page() parsed each page before we had parse_characters_page()."""
+    soup = BeautifulSoup(html, 'html.parser')
+    characters = []
+
+    for item in soup.find_all('div', class_='content-list-item'):
+        card = item.find('div', class_='content-info')
+        if not card:
+            continue
+        name_tag = card.find('h4', class_='character-name')
+        if not name_tag:
+            continue
+        link = name_tag.find('a', href=re.compile(r'^/characters/[^/]+$'))
+        if not link or link['href'].endswith('/new'):
+            continue
+
+        name = link.get_text(strip=True)
+        if not name:
+            continue
+
+        slug = link['href'].split('/')[-1]
+        tags = [a['data-tag'] for a in card.find_all('a', class_='tag-link') if a.get('data-tag')]
+        desc_div = card.find('div', class_='description-text')
+        description = desc_div.get('title', '') if desc_div else ''
+
+        img = item.find('img', class_='game-content-image')
+        avatar_url = img['src'] if img and img.get('src') else ''
+
+        characters.append({
+            'name': name,
+            'slug': slug,
+            'tags': tags,
+            'description': description,
+            'avatar_url': avatar_url,
+        })
+
+    pages = [int(match.group(1)) for a in soup.find_all('a', href=True) if (match := op.PAGE_LINK.search(a['href']))]
+    last_page = max([page] + pages)
+    if soup.find('a', rel='next') is not None:
+        last_page = max(last_page, page + 1)
+    return characters, last_page
+
+
+def parsers() -> dict:
+    """Returns every way we can parse a page, keyed by a label for our results."""
+    variants = {'original': original_parse}
+    for parser in op.HTML_PARSERS:
+        variants[parser] = lambda html, page, parser=parser: op.parse_characters_page(html, page, parser)
+    return variants
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--number', type=int, default=1000, help='calls per timing round')
+    parser.add_argument('--output', help='JSON file to write the results to')
+    args = parser.parse_args(argv)
+
+    fixtures = load_fixtures()
+    variants = parsers()
+    for page, html in fixtures.items():
+        expected = original_parse(html, page)
+        for label, parse in variants.items():
+            if parse(html, page) != expected:
+                sys.exit(f'{label} parsed page {page} differently than the original scraper')
+
+    # each page takes milliseconds to parse, so we do fewer calls than our other suites
+    number = max(1, args.number // 100)
+    results = {}
+    for page, html in fixtures.items():
+        for label, parse in variants.items():
+            results[f'page {page} {label}'] = dict(measure(lambda: parse(html, page), number), bytes=len(html))
+
+    report('parsing', results, args.output)
+
+
+if __name__ == '__main__':
+    main()
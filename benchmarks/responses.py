@@ -0,0 +1,84 @@
+"""
+Benchmarks serializing and compressing the JSON responses of our largest
+ajax endpoints, generate, ministry_generate, and generate_art, with each
+available serializer and Content-Encoding.  generate_art now returns the
+id of a portrait in our image store, so for comparison we also benchmark the
+base64 portrait it used to return.  This runs entirely offline, so rather
+than calling Imagen we fake a portrait by scaling one of our avatars up to
+Imagen's 1024x1024 output size and adding some noise, which gives a PNG of
+about the same size as a real one.
+
+Usage:
+    python -m benchmarks.responses [--number 1000] [--output responses.json]
+"""
+import io
+import os
+import base64
+import argparse
+
+import numpy as np
+from PIL import Image
+
+from chargen import config, serialize
+from chargen.character import Samurai
+from chargen.ministry import generate_ministry_roster
+from benchmarks.timing import measure, report
+
+AVATAR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'avatars', 'tsuruchi-aito.png')
+
+
+def fake_portrait(seed: int = 0) -> str:
+    """Returns a base64 PNG about the size of a portrait from Imagen."""
+    image = Image.open(AVATAR).convert('RGB').resize((1024, 1024), Image.BICUBIC)
+    pixels = np.asarray(image, dtype=np.int16) + np.random.default_rng(seed).integers(-8, 9, (1024, 1024, 3))
+    buffer = io.BytesIO()
+    Image.fromarray(pixels.clip(0, 255).astype(np.uint8)).save(buffer, format='PNG')
+    return base64.b64encode(buffer.getvalue()).decode('ascii')
+
+
+def payloads() -> dict:
+    """Returns a typical response from each endpoint we benchmark."""
+    return {
+        'generate': Samurai(5, seed=1).to_dict(),
+        'ministry_generate': {
+            'seed': 1,
+            'characters': generate_ministry_roster(7, 'wasp', 'tsuruchi', seed=1),
+        },
+        'generate_art': {
+            'image_id': '9f86d081884c7d659a2feaa0c55ad015a3bf4f1b2b0b822cd15d6c15b0f00a08',
+            'image_url': 'images/9f86d081884c7d659a2feaa0c55ad015a3bf4f1b2b0b822cd15d6c15b0f00a08.png',
+            'headshot_crop': {'x': 312, 'y': 96, 'width': 400, 'height': 400},
+            'error': None,
+        },
+        'generate_art (base64)': {
+            'image': fake_portrait(),
+            'headshot_crop': {'x': 312, 'y': 96, 'width': 400, 'height': 400},
+            'error': None,
+        },
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--number', type=int, default=1000, help='calls per timing round')
+    parser.add_argument('--level', type=int, default=config['ajax']['compress_level'], help='compression level')
+    parser.add_argument('--output', help='JSON file to write the results to')
+    args = parser.parse_args(argv)
+
+    results = {}
+    for endpoint, payload in payloads().items():
+        # base64 portraits are thousands of times bigger than the other responses
+        number = max(1, args.number // 1000) if 'image' in payload else args.number
+        for name, dumps in serialize.SERIALIZERS.items():
+            body = dumps(payload)
+            results[f'{endpoint} {name}'] = dict(measure(lambda: dumps(payload), number), bytes=len(body))
+        for encoding in serialize.COMPRESSORS:
+            compressed = serialize.compress(body, encoding, args.level)
+            result = measure(lambda: serialize.compress(body, encoding, args.level), number)
+            results[f'{endpoint} {encoding} level {args.level}'] = dict(result, bytes=len(compressed))
+
+    report('responses', results, args.output)
+
+
+if __name__ == '__main__':
+    main()
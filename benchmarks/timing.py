@@ -0,0 +1,53 @@
+"""Shared helpers for timing benchmarks and writing their results."""
+import json
+import platform
+import statistics
+import sys
+from datetime import datetime, timezone
+from timeit import Timer
+
+from chargen import __version__
+
+
+def measure(func, number: int = 1000, repeat: int = 5) -> dict:
+    """
+    Calls func() number times in each of repeat rounds (after a warmup round)
+    and returns the per-call latency in microseconds and the throughput.
+    """
+    timer = Timer(func)
+    timer.timeit(max(1, number // 10))
+    rounds = [total / number for total in timer.repeat(repeat=repeat, number=number)]
+    return {
+        'calls': number * repeat,
+        'mean_us': statistics.mean(rounds) * 1e6,
+        'median_us': statistics.median(rounds) * 1e6,
+        'min_us': min(rounds) * 1e6,
+        'max_us': max(rounds) * 1e6,
+        'calls_per_sec': 1 / statistics.median(rounds),
+    }
+
+
+def report(name: str, results: dict, output: str = None):
+    """
+    Prints a table of results (a dict of benchmark name -> measure() result,
+    optionally with the size in bytes of whatever was produced) and writes
+    them along with some environment info to the output JSON file, so that
+    runs from different releases can be compared.
+    """
+    sizes = any('bytes' in result for result in results.values())
+    print(f'{name:<40} {"median us":>12} {"min us":>12} {"calls/sec":>12}' + (f' {"bytes":>12}' if sizes else ''))
+    for label, result in results.items():
+        print(f'{label:<40} {result["median_us"]:>12.2f} {result["min_us"]:>12.2f} {result["calls_per_sec"]:>12.0f}'
+              + (f' {result.get("bytes", ""):>12}' if sizes else ''))
+
+    if output:
+        with open(output, 'w') as f:
+            json.dump({
+                'suite': name,
+                'version': __version__,
+                'python': sys.version.split()[0],
+                'platform': platform.platform(),
+                'timestamp': datetime.now(timezone.utc).isoformat(),
+                'results': results,
+            }, f, indent=2)
+        print(f'\nWrote results to {output}')
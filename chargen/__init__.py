@@ -5,6 +5,13 @@ from configobj import ConfigObj
 
 __here__ = os.path.abspath(os.path.dirname(__file__))
 
+CONFIG_FILES = [
+    os.path.join(__here__, 'configspec.ini'),
+    os.path.abspath(os.path.join(__here__, '..', 'development-defaults.ini')),
+    os.path.abspath(os.path.join(__here__, '..', 'development-secrets.ini')),
+]
+"""Our spec, defaults, and secrets files, in the order described in parse_config()."""
+
 
 def parse_config() -> ConfigObj:
     """
@@ -13,12 +20,9 @@ def parse_config() -> ConfigObj:
     2) development-defaults.ini has the default values which we check into git
     3) development-secrets.ini is where we store sensitive values like passwords
     """
-    specfile = os.path.join(__here__, 'configspec.ini')
+    specfile, development_defaults_fpath, development_secrets_fpath = CONFIG_FILES
     spec = ConfigObj(specfile, interpolation=False, list_values=False, encoding='utf-8', _inspec=True)
 
-    development_defaults_fpath = os.path.abspath(os.path.join(__here__, '..', 'development-defaults.ini'))
-    development_secrets_fpath = os.path.abspath(os.path.join(__here__, '..', 'development-secrets.ini'))
-
     config = ConfigObj(development_defaults_fpath, encoding='utf-8', configspec=spec)
     config.merge(ConfigObj(development_secrets_fpath, encoding='utf-8', configspec=spec))
 
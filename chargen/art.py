@@ -4,15 +4,17 @@ Art generation for NPC portraits using Google Gemini's image generation API.
 This module generates character portrait prompts based on NPC attributes and
 uses Gemini 2.5 Flash Image to create the artwork.
 """
-import base64
+import random
 import subprocess
 import sys
+from random import Random
 
 from google import genai
 from google.genai import types
 
 from chargen import config
 from chargen import constants as c
+from chargen.metrics import timed
 
 
 def _get_client():
@@ -27,6 +29,7 @@ def _get_client():
     return genai.Client(api_key=api_key)
 
 
+@timed
 def trim_whitespace(image_data: bytes) -> bytes:
     """
     Trim whitespace from around an image using ImageMagick.
@@ -67,12 +70,13 @@ def trim_whitespace(image_data: bytes) -> bytes:
         return image_data
 
 
-def generate_prompt(character: dict) -> str:
+def generate_prompt(character: dict, rng: Random = None) -> str:
     """
     Generate an art prompt based on character attributes.
 
     Args:
         character: A dict containing character attributes (from Character.to_dict())
+        rng: Optional seeded Random to use for the random parts of the prompt
 
     Returns:
         str: A prompt suitable for image generation
@@ -88,7 +92,7 @@ def generate_prompt(character: dict) -> str:
 
     # Random age on a bell curve centered around mid-30s, shifted by XP
     # Higher XP characters tend to be older (~5 years per 75 XP above baseline)
-    import random
+    rng = rng or random
     age_options = [
         'late teens',
         'early 20s',
@@ -109,10 +113,10 @@ def generate_prompt(character: dict) -> str:
     xp_shift = (xp - 50) / 75.0
 
     # Pick from base distribution, then apply XP shift
-    base_index = random.choices(range(len(age_options)), weights=base_weights)[0]
+    base_index = rng.choices(range(len(age_options)), weights=base_weights)[0]
     shifted_index = base_index + xp_shift
     # Add a little randomness to the shift (+/- 0.5 brackets)
-    shifted_index += random.uniform(-0.5, 0.5)
+    shifted_index += rng.uniform(-0.5, 0.5)
     # Clamp to valid range
     final_index = max(0, min(len(age_options) - 1, round(shifted_index)))
     age_desc = age_options[final_index]
@@ -286,6 +290,7 @@ def generate_prompt(character: dict) -> str:
     return '\n'.join(lines)
 
 
+@timed
 def generate_image(prompt: str) -> bytes:
     """
     Generate an image from a prompt using Google Imagen 4.
@@ -322,20 +327,7 @@ def generate_image(prompt: str) -> bytes:
     return trim_whitespace(image_bytes)
 
 
-def generate_image_base64(prompt: str) -> str:
-    """
-    Generate an image and return it as a base64-encoded string.
-
-    Args:
-        prompt: The text prompt describing the image to generate
-
-    Returns:
-        str: Base64-encoded PNG image data (suitable for data: URLs)
-    """
-    image_bytes = generate_image(prompt)
-    return base64.b64encode(image_bytes).decode('utf-8')
-
-
+@timed
 def get_headshot_crop(image_data: bytes) -> tuple[int, int, int, int]:
     """
     Detect the face in an image and return suggested headshot crop coordinates.
@@ -1,31 +1,43 @@
 import re
+from bisect import bisect_right
+from itertools import accumulate
+from os import stat
 from os.path import join
 from copy import deepcopy
-from random import random, randrange, normalvariate, choice
+import random
+from random import Random
+
+import numpy as np
 
 from chargen import config
 from chargen import constants as c
+from chargen.seeds import SEED_BITS, parse_seed
 
 
 def rounded(x: int, minval=1, maxval=15) -> int:
     return min(maxval, max(minval, round(x * 2) / 2))
 
 
-def unused_name(gender: str = None) -> tuple[str, str]:
+def rounded_array(x: np.ndarray, minval=1, maxval=15) -> np.ndarray:
+    """The vectorized equivalent of rounded(), used by the batch generators."""
+    return np.clip(np.round(x * 2) / 2, minval, maxval)
+
+
+def unused_name(gender: str = None, rng: Random = None, names=None) -> tuple[str, str]:
     """
     When randomly generating a name, we want to make sure that we don't pick a
     name which is already in use in this campaign.  We maintain a global set of
-    existing names and then keep randomly picking a new name until we find one
-    which we haven't already used.
+    existing names which also tracks the pool of unused names for each gender,
+    so we just pick one from that pool.  This raises a ValueError if every name
+    of the given gender has already been used.  Callers can pass any other
+    names object with the same choose() method, e.g. a NameLeases.
     """
-    name = None
-    gender = gender or choice(['male','female'])
-    while not name or name in c.USED_NAMES:
-        name = choice(list(c.NAMES[gender]))
+    gender = gender or (rng or random).choice(['male','female'])
+    name = (names or c.USED_NAMES).choose(gender, rng)
     return name, c.NAMES[gender][name]
 
 
-def weighted_choice(d: dict) -> str:
+def weighted_choice(d: dict, rng: Random = None) -> str:
     """
     We have a lot of attributes with weighted options, e.g. when generating a
     character we might pick their school via these options:
@@ -40,7 +52,7 @@ def weighted_choice(d: dict) -> str:
     not defined different houses in our config, etc.
     """
     if d:
-        roll = randrange(sum(d.values()))
+        roll = (rng or random).randrange(sum(d.values()))
         total = 0
         for choice, percent in d.items():
             total += percent
@@ -50,26 +62,175 @@ def weighted_choice(d: dict) -> str:
         return ''
 
 
+def unused_names(gender: str, n: int, rng: np.random.Generator, names=None) -> list[str]:
+    """
+    Batch version of unused_name(): returns n names of the given gender drawn
+    uniformly from the names which aren't already used in this campaign.  By
+    default these come from c.USED_NAMES, but callers can pass any other object
+    with the same choose_many() method, e.g. one which reserves names across
+    several processes.
+    """
+    return (names or c.USED_NAMES).choose_many(gender, n, rng)
+
+
+class WeightedSampler:
+    """
+    This is a precomputed version of weighted_choice() for a fixed dict of
+    weighted options: we compute the cumulative weights once, and then each
+    pick is a single randrange() plus a binary search rather than summing and
+    scanning the whole dict.  Like weighted_choice(), an empty dict of options
+    always picks the empty string.
+    """
+    def __init__(self, d: dict):
+        self.options = list(d)
+        self.cumulative = list(accumulate(d.values()))
+
+    def choice(self, rng: Random = None) -> str:
+        if not self.options:
+            return ''
+        return self.options[bisect_right(self.cumulative, (rng or random).randrange(self.cumulative[-1]))]
+
+    def choices(self, n: int, rng: np.random.Generator) -> list[str]:
+        """Batch version of choice(), returning n independent picks."""
+        if not self.options:
+            return [''] * n
+        rolls = rng.integers(self.cumulative[-1], size=n)
+        return [self.options[i] for i in np.searchsorted(self.cumulative, rolls, side='right')]
+
+
+EMPTY_SAMPLER = WeightedSampler({})
+"""Always picks the empty string, e.g. for the houses of a family which doesn't have any."""
+
+_samplers = {}
+"""
+WeightedSampler instances for each weighted section of our config, see
+section_sampler().  Like the compiled trait tables, these are built once per
+process and thus rebuilt whenever the autoreloader restarts us.
+"""
+
+
+def section_sampler(section: str, name: str = None, default: str = None) -> WeightedSampler:
+    """
+    Returns the precomputed sampler for a weighted section of our config, e.g.
+    section_sampler('clans') for [clans] or section_sampler('clan', 'lion') for
+    the [[lion]] subsection of [clan].  If the subsection doesn't exist then we
+    use the default subsection if one is given (e.g. [schools] has [[default]])
+    or else an empty sampler which always picks the empty string.
+    """
+    if name is not None and name not in config[section]:
+        # names can come from request parameters, so we only cache samplers for subsections which exist
+        if not default:
+            return EMPTY_SAMPLER
+        name = default
+
+    key = (section, name)
+    if key not in _samplers:
+        _samplers[key] = WeightedSampler(config[section] if name is None else config[section][name])
+    return _samplers[key]
+
+
+def grouped_choices(parents: list[str], section: str, rng: np.random.Generator, default: str = None) -> list[str]:
+    """
+    Our config is hierarchical (clan -> family -> house -> lineage), so each
+    pick depends on the one before it.  This takes the list of parent picks and
+    does one batch choices() call per distinct parent, e.g. all of the Lion
+    samurai get their families drawn from config['clan']['lion'] at once.
+    """
+    groups = {}
+    for i, parent in enumerate(parents):
+        groups.setdefault(parent, []).append(i)
+
+    result = [''] * len(parents)
+    for parent, indices in groups.items():
+        picks = section_sampler(section, parent, default).choices(len(indices), rng)
+        for i, pick in zip(indices, picks):
+            result[i] = pick
+    return result
+
+
+def compile_traits(pool: dict) -> tuple:
+    """
+    Traits are defined in the format documented in constants.py, e.g.
+
+        'thin / fat': (0.10, 0.05)
+
+    where each subtrait is rolled in order until one succeeds.  Splitting those
+    strings and walking the subtraits for every character is wasteful, so this
+    compiles a pool of traits into a flat tuple of exclusive groups, each of
+    which is a (cumulative thresholds, names) pair, e.g.
+
+        ((0.10, 0.145), ('thin', 'fat'))
+
+    since fat is only rolled when thin wasn't, i.e. 0.90 * 0.05 of the time.
+    A single random() roll then picks at most one trait from each group.
+    Traits like 'a / b' with a single chance pick uniformly between options.
+    """
+    table = []
+    for trait, chance in pool.items():
+        names = [name.strip() for name in trait.split('/')]
+        if '/' in trait and isinstance(chance, tuple):
+            names, probabilities, remaining = names[:len(chance)], [], 1.0
+            for subchance in chance[:len(names)]:
+                probabilities.append(remaining * subchance)
+                remaining *= 1 - subchance
+        else:
+            probabilities = [chance / len(names)] * len(names)
+        table.append((tuple(accumulate(probabilities)), tuple(names)))
+    return tuple(table)
+
+
+_trait_tables = {}
+"""
+Compiled trait tables keyed by (character type, gender), see trait_table().
+These are built from constants.py, so they're rebuilt whenever the server
+restarts, which the autoreloader does whenever our code or config changes.
+"""
+
+
+_templates = {}
+"""
+Compiled templates keyed by (character type, filename), each stored along with
+the mtime of the file it was read from; see Character.compiled_template().
+"""
+
+
+def advantages_table() -> tuple:
+    """Returns the compiled ADVANTAGES_AND_DISADVANTAGES table shared by all types."""
+    if 'advantages' not in _trait_tables:
+        _trait_tables['advantages'] = compile_traits(c.ADVANTAGES_AND_DISADVANTAGES)
+    return _trait_tables['advantages']
+
+
 class Character:
     """
     This is the parent class used to generate characters.  It defines 
     """
-    def __init__(self):
-        self.gender = choice(['male', 'female'])
-        self.personal_name, self.name_meaning = unused_name(self.gender)
+    def __init__(self, names=None):
+        self.gender = self._rng.choice(['male', 'female'])
+        self.personal_name, self.name_meaning = unused_name(self.gender, self._rng, names)
 
         self.xp = self.gen_xp()
         self.honor = self.gen_honor()
         self.traits = self.gen_traits()
         self.collects = ''
         if 'collector' in self.traits:
-            item = choice(c.COLLECTABLES)
+            item = self._rng.choice(c.COLLECTABLES)
             self.collects = item['name']
             self.collects_art = item['art']
             # Replace generic trait with specific one
             self.traits[self.traits.index('collector')] = f'collects {item["name"]}'
         self.tags = self.gen_tags()
-        self.id = str(randrange(1e9))
+        self.id = str(self._rng.randrange(1e9))
+
+    def _init_rng(self, seed=None):
+        """
+        Subclasses call this before generating anything, since all of our
+        randomness comes from this character's own Random object rather than
+        the global random module; see seeds.py for details.  The seed is part
+        of to_dict() but the Random object isn't.
+        """
+        self.seed = parse_seed(seed)
+        self._rng = Random(self.seed)
 
     @classmethod
     def types(cls):
@@ -79,6 +240,79 @@ class Character:
             types.update(subclass.types())
         return types
 
+    @classmethod
+    def batch(cls, n: int, seed: int = None, names=None, **params) -> list['Character']:
+        """
+        Generate n characters of this type at once.  Rather than rolling each
+        character one scalar random() call at a time, we draw every random
+        number for the whole batch as numpy arrays and only build the
+        per-character objects at the very end.  The results have the same
+        distributions as calling the constructor n times.
+
+        The batch as a whole is reproducible from its seed, but the individual
+        characters can't be regenerated on their own, so their seed is None.
+        Personal names are picked from names (see unused_names() for details).
+
+        Subclasses override this to add their own columns (rank, clan, etc)
+        and then call _batch_common() for the attributes every character has.
+        For types which don't, this just calls the constructor n times, with
+        seeds drawn from the seed of the batch, so the characters are still
+        reproducible from that seed (and from their own seeds too).
+        """
+        seeds = Random(parse_seed(seed))
+        return [cls(seed=seeds.getrandbits(SEED_BITS), names=names, **params) for _ in range(n)]
+
+    @classmethod
+    def _batch_common(cls, n: int, rng: np.random.Generator, columns: dict, tag_columns=('rank',), names=None) -> list['Character']:
+        """
+        Given the type-specific columns (which must include 'rank'), this draws
+        everything that Character.__init__ would have generated and returns
+        the list of character objects.
+
+        Tags only depend on a few of those columns (tag_columns), so we call
+        gen_tags() once per distinct combination rather than once per character.
+        """
+        rank = np.asarray(columns['rank'], dtype=float)
+        genders = np.array(['male', 'female'])[rng.integers(2, size=n)].tolist()
+
+        personal_names = [''] * n
+        for gender in ['male', 'female']:
+            indices = [i for i, g in enumerate(genders) if g == gender]
+            for i, name in zip(indices, unused_names(gender, len(indices), rng, names)):
+                personal_names[i] = name
+
+        xp = cls.batch_xp(rng, rank).tolist()
+        honor = cls.batch_honor(rng, rank).tolist()
+        traits = cls.batch_traits(rng, genders)
+        collectables = rng.integers(len(c.COLLECTABLES), size=n).tolist()
+        ids = rng.integers(int(1e9), size=n).tolist()
+
+        tags = {}
+        characters = []
+        for i in range(n):
+            character = cls.__new__(cls)
+            character.seed = None
+            character.__dict__.update({key: values[i] for key, values in columns.items()})
+            character.gender = genders[i]
+            character.personal_name = personal_names[i]
+            character.name_meaning = c.NAMES[genders[i]][personal_names[i]]
+            character.xp = xp[i]
+            character.honor = honor[i]
+            character.traits = traits[i]
+            character.collects = ''
+            if 'collector' in character.traits:
+                item = c.COLLECTABLES[collectables[i]]
+                character.collects = item['name']
+                character.collects_art = item['art']
+                character.traits[character.traits.index('collector')] = f'collects {item["name"]}'
+            tag_key = tuple(columns[key][i] for key in tag_columns)
+            if tag_key not in tags:
+                tags[tag_key] = character.gen_tags()
+            character.tags = list(tags[tag_key])
+            character.id = str(ids[i])
+            characters.append(character)
+        return characters
+
     def gen_xp(self) -> int:
         """
          A person at their gempukku has on average about 150 XP.  Here's a chart
@@ -113,46 +347,98 @@ class Character:
             if self.rank >= int(rank):
                 base = rank_base
 
-        while random() < 0.10:
+        while self._rng.random() < 0.10:
             base += 50
-        return base + 5 * randrange(10)
+        return base + 5 * self._rng.randrange(10)
+
+    @classmethod
+    def batch_xp(cls, rng: np.random.Generator, rank: np.ndarray) -> np.ndarray:
+        """
+        Batch version of gen_xp().  The number of times the "while random() <
+        0.10" loop adds 50 XP is geometrically distributed, so we draw that
+        count directly rather than looping.
+        """
+        base = np.zeros(len(rank), dtype=int)
+        for min_rank, rank_base in config['rank_xp_bases'][cls.__name__].items():
+            base = np.where(rank >= int(min_rank), rank_base, base)
+        return base + 50 * (rng.geometric(0.90, size=len(rank)) - 1) + 5 * rng.integers(10, size=len(rank))
 
     def gen_honor(self, base=2.0) -> float:
         """
         We presume that higher ranking people are more likely to have a slightly
         honor score, and this implements a normal distribution for that.
         """
-        if random() < 0.50 + self.rank * 0.03:
-            return rounded(base + abs(normalvariate(0, 1.0)), maxval=5)
+        if self._rng.random() < 0.50 + self.rank * 0.03:
+            return rounded(base + abs(self._rng.normalvariate(0, 1.0)), maxval=5)
         else:
-            return rounded(base - abs(normalvariate(0, 0.5)), minval=1)
+            return rounded(base - abs(self._rng.normalvariate(0, 0.5)), minval=1)
+
+    @classmethod
+    def batch_honor(cls, rng: np.random.Generator, rank: np.ndarray, base=2.0) -> np.ndarray:
+        """Batch version of gen_honor()."""
+        n = len(rank)
+        higher = rng.random(n) < 0.50 + rank * 0.03
+        return np.where(higher,
+                        rounded_array(base + np.abs(rng.normal(0, 1.0, n)), maxval=5),
+                        rounded_array(base - np.abs(rng.normal(0, 0.5, n)), minval=1))
 
-    def _trait_pool(self) -> dict:
+    @classmethod
+    def _trait_pool(cls, gender: str) -> dict:
         """Returns the pool of possible traits for this character type."""
-        return dict(c.TRAITS, **c.GENDER_TRAITS[self.gender])
+        return dict(c.TRAITS, **c.GENDER_TRAITS[gender])
+
+    @classmethod
+    def trait_table(cls, gender: str) -> tuple:
+        """
+        Returns the compiled trait table for this character type and gender;
+        these are compiled the first time they're needed and then cached.
+        """
+        key = (cls, gender)
+        if key not in _trait_tables:
+            _trait_tables[key] = compile_traits(cls._trait_pool(gender))
+        return _trait_tables[key]
 
-    def _roll_traits(self, pool: dict) -> list[str]:
-        """Roll for traits from a given pool, returning those that were selected."""
+    def _roll_traits(self, table: tuple) -> list[str]:
+        """Roll for traits from a compiled table, returning those that were selected."""
         traits = []
-        for trait, chance in pool.items():
-            if '/' in trait and isinstance(chance, tuple):
-                for subtrait, subchance in zip(trait.split('/'), chance):
-                    if random() < subchance:
-                        traits.append(subtrait.strip())
-                        break
-            else:
-                if random() < chance:
-                    traits.append(trait if '/' not in trait else choice(trait.split('/')).strip())
+        for thresholds, names in table:
+            roll = self._rng.random()
+            if roll < thresholds[-1]:
+                traits.append(names[bisect_right(thresholds, roll)])
         return sorted(traits)
 
+    @staticmethod
+    def _batch_roll_traits(rng: np.random.Generator, table: tuple, n: int) -> list[list[str]]:
+        """
+        Batch version of _roll_traits(): rolls every group in the compiled table
+        for n characters at once.
+        """
+        traits = [[] for _ in range(n)]
+        for thresholds, names in table:
+            picks = np.searchsorted(thresholds, rng.random(n), side='right')
+            for row in np.flatnonzero(picks < len(names)):
+                traits[row].append(names[picks[row]])
+        return [sorted(t) for t in traits]
+
     def gen_traits(self) -> list[str]:
         """Returns a list of randomly generated traits for this character.
         Advantages and disadvantages are always listed first.
         """
-        advantages = self._roll_traits(c.ADVANTAGES_AND_DISADVANTAGES)
-        traits = self._roll_traits(self._trait_pool())
+        advantages = self._roll_traits(advantages_table())
+        traits = self._roll_traits(self.trait_table(self.gender))
         return advantages + traits
 
+    @classmethod
+    def batch_traits(cls, rng: np.random.Generator, genders: list[str]) -> list[list[str]]:
+        """Batch version of gen_traits(), given the gender of each character."""
+        advantages = cls._batch_roll_traits(rng, advantages_table(), len(genders))
+        traits = [[] for _ in genders]
+        for gender in ['male', 'female']:
+            indices = [i for i, g in enumerate(genders) if g == gender]
+            for i, rolled in zip(indices, cls._batch_roll_traits(rng, cls.trait_table(gender), len(indices))):
+                traits[i] = rolled
+        return [a + t for a, t in zip(advantages, traits)]
+
     def gen_tags(self) -> list[str]:
         """
         Not all NPCs are samurai, and not all samurai are from a specific vassal
@@ -177,12 +463,42 @@ class Character:
             self.lineage and (self.lineage_display + ' Lineage')
         ]))
 
+    @classmethod
+    def adapt_template(cls, template: str) -> str:
+        """
+        All character types share the same templates, but some types display
+        things a little differently (e.g. peasants have no rank), so subclasses
+        can override this to tweak the template text when it's compiled.
+        """
+        return template
+
+    @classmethod
+    def compiled_template(cls, fname: str) -> tuple[str, ...]:
+        """
+        Returns the given template for this character type, split into its
+        blank-line-separated paragraphs.  Templates are read from disk and
+        compiled once, and then recompiled only if the file is modified.
+        """
+        path = join(c.HERE, 'templates', fname)
+        mtime = stat(path).st_mtime_ns
+        compiled = _templates.get((cls, fname))
+        if not compiled or compiled[0] != mtime:
+            with open(path) as f:
+                template = cls.adapt_template(f.read())
+            compiled = _templates[cls, fname] = (mtime, tuple(re.split(r'\n{2,}', template.strip())))
+        return compiled[1]
+
     def render(self, fname: str) -> str:
-        with open(join(c.HERE, 'templates', fname)) as f:
-            return re.sub(r'\n{3,}', '\n\n', f.read().format(character=self).strip())
+        """
+        Renders the given template for this character.  Paragraphs which come
+        out empty (e.g. a character with no traits) are omitted so that we never
+        output more than one blank line in a row.
+        """
+        paragraphs = (paragraph.format(character=self).strip('\n') for paragraph in self.compiled_template(fname))
+        return '\n\n'.join(filter(None, paragraphs)).strip()
 
     def to_dict(self):
-        return dict(self.__dict__, **{
+        return dict({k: v for k, v in self.__dict__.items() if not k.startswith('_')}, **{
             'public': self.render('public_info.txt'),
             'private': self.render('private_info.txt')
         })
@@ -200,19 +516,50 @@ class Character:
 
 
 class Samurai(Character):
-    def __init__(self, base_rank, clan=None, family=None, house=None, lineage=None, school=None):
+    def __init__(self, base_rank, clan=None, family=None, house=None, lineage=None, school=None, seed=None, names=None):
+        self._init_rng(seed)
         self.base_rank = int(base_rank)
-        self.rank = rounded(normalvariate(self.base_rank, 0.3), minval=self.base_rank - 1, maxval=self.base_rank + 1)
-        self.recognition = rounded(normalvariate(self.rank, 1))
+        self.rank = rounded(self._rng.normalvariate(self.base_rank, 0.3), minval=self.base_rank - 1, maxval=self.base_rank + 1)
+        self.recognition = rounded(self._rng.normalvariate(self.rank, 1))
 
-        self.clan = clan or weighted_choice(config['clans'])
-        self.family = family or weighted_choice(config['clan'].get(self.clan, {}))
-        self.house = house or weighted_choice(config['family'].get(self.family, {}))
-        self.lineage = lineage or weighted_choice(config['house'].get(self.house, {}))
-        self.school = school or weighted_choice(config['schools'].get(self.clan, config['schools']['default']))
+        self.clan = clan or section_sampler('clans').choice(self._rng)
+        self.family = family or section_sampler('clan', self.clan).choice(self._rng)
+        self.house = house or section_sampler('family', self.family).choice(self._rng)
+        self.lineage = lineage or section_sampler('house', self.house).choice(self._rng)
+        self.school = school or section_sampler('schools', self.clan, default='default').choice(self._rng)
 
-        Character.__init__(self)
+        Character.__init__(self, names)
+        self._finish()
 
+    @classmethod
+    def batch(cls, n: int, base_rank, clan=None, family=None, house=None, lineage=None, school=None, seed: int = None, names=None) -> list['Samurai']:
+        rng = np.random.default_rng(seed)
+        base_rank = int(base_rank)
+        rank = rounded_array(rng.normal(base_rank, 0.3, n), minval=base_rank - 1, maxval=base_rank + 1)
+        recognition = rounded_array(rng.normal(rank, 1))
+
+        clans = [clan] * n if clan else section_sampler('clans').choices(n, rng)
+        families = [family] * n if family else grouped_choices(clans, 'clan', rng)
+        houses = [house] * n if house else grouped_choices(families, 'family', rng)
+        lineages = [lineage] * n if lineage else grouped_choices(houses, 'house', rng)
+        schools = [school] * n if school else grouped_choices(clans, 'schools', rng, default='default')
+
+        characters = cls._batch_common(n, rng, {
+            'base_rank': [base_rank] * n,
+            'rank': rank.tolist(),
+            'recognition': recognition.tolist(),
+            'clan': clans,
+            'family': families,
+            'house': houses,
+            'lineage': lineages,
+            'school': schools,
+        }, tag_columns=('base_rank', 'clan', 'family', 'house', 'lineage'), names=names)
+        for character in characters:
+            character._finish()
+        return characters
+
+    def _finish(self):
+        """Everything we do after the generic Character attributes are set."""
         # Wasp clan Ren lineage samurai are peasantborn
         if self.clan == 'wasp' and self.lineage == 'ren':
             self.traits.append('Peasantborn')
@@ -226,44 +573,78 @@ class Samurai(Character):
             self.personal_name
         ]))
 
-    def _trait_pool(self) -> dict:
+    @classmethod
+    def _trait_pool(cls, gender: str) -> dict:
         """Samurai get additional samurai-specific traits."""
-        return dict(Character._trait_pool(self), **c.SAMURAI_TRAITS)
+        return dict(Character._trait_pool(gender), **c.SAMURAI_TRAITS)
 
     def gen_tags(self) -> list[str]:
         return Character.gen_tags(self) + ([config['ranks']['Samurai'][str(self.base_rank)]] if self.base_rank > 4 else [])
 
 
 class Peasant(Character):
-    def __init__(self, base_rank=0, **ignored):
+    def __init__(self, base_rank=0, seed=None, names=None, **ignored):
+        self._init_rng(seed)
         self.rank = int(base_rank)
-        Character.__init__(self)
-        self.recognition = rounded(normalvariate(self.rank + 2, 1))
+        Character.__init__(self, names)
+        self.recognition = rounded(self._rng.normalvariate(self.rank + 2, 1))
         self.full_name = self.personal_name
         self.school = ''
 
-    def render(self, fname: str) -> str:
-        return re.sub('\nRank: .*', '', super().render(fname))
+    @classmethod
+    def batch(cls, n: int, base_rank=0, seed: int = None, names=None, **ignored) -> list['Peasant']:
+        rng = np.random.default_rng(seed)
+        rank = int(base_rank)
+        characters = cls._batch_common(n, rng, {'rank': [rank] * n}, names=names)
+        recognition = rounded_array(rng.normal(rank + 2, 1, n)).tolist()
+        for character, recog in zip(characters, recognition):
+            character.recognition = recog
+            character.full_name = character.personal_name
+            character.school = ''
+        return characters
+
+    @classmethod
+    def adapt_template(cls, template: str) -> str:
+        return '\n'.join(line for line in template.split('\n') if not line.startswith('Rank: '))
 
     def gen_tags(self) -> list[str]:
         return ['peasant']
 
 
 class Monk(Character):
-    def __init__(self, base_rank, **ignored):
+    def __init__(self, base_rank, seed=None, names=None, **ignored):
+        self._init_rng(seed)
         self.rank = int(base_rank)
-        Character.__init__(self)
+        Character.__init__(self, names)
         self.school = ''
         self.full_name = self.personal_name
-        self.recognition = rounded(normalvariate(10 - self.rank + 1, 2))  # the +1 and higher variance indicates the esteem for monks
+        self.recognition = rounded(self._rng.normalvariate(10 - self.rank + 1, 2))  # the +1 and higher variance indicates the esteem for monks
+
+    @classmethod
+    def batch(cls, n: int, base_rank, seed: int = None, names=None, **ignored) -> list['Monk']:
+        rng = np.random.default_rng(seed)
+        rank = int(base_rank)
+        characters = cls._batch_common(n, rng, {'rank': [rank] * n}, names=names)
+        recognition = rounded_array(rng.normal(10 - rank + 1, 2, n)).tolist()
+        for character, recog in zip(characters, recognition):
+            character.school = ''
+            character.full_name = character.personal_name
+            character.recognition = recog
+        return characters
 
     def gen_tags(self) -> list[str]:
         return ['Order of Bishamon', config['ranks']['Monk'][str(self.rank)]]
 
     def gen_honor(self, base=3.0) -> float:
         variance = 1.1 - self.rank / 10
-        direction = choice([-1, 1])
-        return rounded(base + direction * abs(normalvariate(0, variance)), minval=1, maxval=5)
+        direction = self._rng.choice([-1, 1])
+        return rounded(base + direction * abs(self._rng.normalvariate(0, variance)), minval=1, maxval=5)
+
+    @classmethod
+    def batch_honor(cls, rng: np.random.Generator, rank: np.ndarray, base=3.0) -> np.ndarray:
+        variance = 1.1 - rank / 10
+        direction = rng.choice([-1, 1], size=len(rank))
+        return rounded_array(base + direction * np.abs(variance * rng.standard_normal(len(rank))), minval=1, maxval=5)
 
     def gen_xp(self) -> int:
         base = 0
@@ -271,9 +652,17 @@ class Monk(Character):
             if self.rank <= int(rank):
                 base = rank_base
 
-        while random() < 0.10:
+        while self._rng.random() < 0.10:
             base += 50
-        return base + 5 * randrange(10)
+        return base + 5 * self._rng.randrange(10)
 
-    def render(self, fname: str) -> str:
-        return super().render(fname).replace('\nRank: ', '\nSeat: ')
+    @classmethod
+    def batch_xp(cls, rng: np.random.Generator, rank: np.ndarray) -> np.ndarray:
+        base = np.zeros(len(rank), dtype=int)
+        for max_rank, rank_base in config['rank_xp_bases'][cls.__name__].items():
+            base = np.where(rank <= int(max_rank), rank_base, base)
+        return base + 50 * (rng.geometric(0.90, size=len(rank)) - 1) + 5 * rng.integers(10, size=len(rank))
+
+    @classmethod
+    def adapt_template(cls, template: str) -> str:
+        return template.replace('\nRank: ', '\nSeat: ')
@@ -1,6 +1,7 @@
 import os
 
 from chargen import config, __here__ as HERE
+from chargen.names import UsedNames
 
 __all__ = ['HERE', 'NAMES', 'USED_NAMES', 'XP_DIST', 'TRAITS', 'ADVANTAGES_AND_DISADVANTAGES', 'GENDER_TRAITS', 'SAMURAI TRAITS', 'MINISTRIES']
 
@@ -24,10 +25,11 @@ for _gender in ['male', 'female']:
             for line in name_lines
         }
 
-USED_NAMES = set()
+USED_NAMES = UsedNames(NAMES)
 """
 This is updated with the personal names (e.g. 'Gohei' instead of 'Matsu Gohei')
-of all of the characters already in Obsidian Portal.
+of all of the characters already in Obsidian Portal.  It also keeps a pool of
+the unused names for each gender; see names.py for details.
 """
 
 HOUSE_NAMES = set()
@@ -0,0 +1,114 @@
+"""
+A disk-backed store for our generated portraits.
+
+Rather than sending every portrait to the browser as base64 JSON and then
+having the browser send it all back to us when uploading, we save each image
+here under the SHA-256 hash of its contents and give the browser that id plus
+a URL to fetch the PNG from.  The URL for an id always returns the same image,
+so browsers can cache it forever, and the upload endpoints just take the id.
+
+The store holds at most max_bytes of images, evicting the least recently used
+ones when it fills up.  We keep the recency order in each file's mtime, so it
+survives restarts (which happen whenever our code or config changes).
+"""
+import os
+import re
+import hashlib
+import tempfile
+from threading import Lock
+from collections import OrderedDict
+
+from chargen import config
+
+DEFAULT_DIRECTORY = os.path.join(tempfile.gettempdir(), 'chargen-images')
+
+IMAGE_ID = re.compile(r'^[0-9a-f]{64}$')
+
+
+def image_id(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+class ImageStore:
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.lock = Lock()
+        self.sizes = OrderedDict()  # image id -> size in bytes, from least to most recently used
+
+        if os.path.isdir(directory):
+            files = [entry for entry in os.scandir(directory) if entry.name.endswith('.png') and IMAGE_ID.match(entry.name[:-4])]
+            for entry in sorted(files, key=lambda entry: entry.stat().st_mtime):
+                self.sizes[entry.name[:-4]] = entry.stat().st_size
+        self.total = sum(self.sizes.values())
+
+    def path(self, image_id: str) -> str:
+        """Returns the file path for an image id, raising a ValueError if it's not a valid id."""
+        if not IMAGE_ID.match(image_id):
+            raise ValueError(f'{image_id!r} is not a valid image id')
+        return os.path.join(self.directory, image_id + '.png')
+
+    def __contains__(self, image_id: str) -> bool:
+        return image_id in self.sizes
+
+    def put(self, data: bytes) -> str:
+        """Saves an image (if we don't already have it) and returns its id."""
+        new_id = image_id(data)
+        path = self.path(new_id)
+        with self.lock:
+            if new_id in self.sizes:
+                self._touch(new_id)
+                return new_id
+
+            os.makedirs(self.directory, exist_ok=True)
+            temp_path = f'{path}.{os.getpid()}.tmp'
+            with open(temp_path, 'wb') as f:
+                f.write(data)
+            os.replace(temp_path, path)
+            self.sizes[new_id] = len(data)
+            self.total += len(data)
+            self._evict()
+        return new_id
+
+    def get(self, image_id: str) -> bytes:
+        """Returns the image with the given id, raising a KeyError if we don't have it."""
+        path = self.path(image_id)
+        with self.lock:
+            if image_id not in self.sizes:
+                raise KeyError(image_id)
+            self._touch(image_id)
+        try:
+            with open(path, 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            self.discard(image_id)
+            raise KeyError(image_id)
+
+    def discard(self, image_id: str):
+        with self.lock:
+            self.total -= self.sizes.pop(image_id, 0)
+        try:
+            os.remove(self.path(image_id))
+        except FileNotFoundError:
+            pass
+
+    def _touch(self, image_id: str):
+        self.sizes.move_to_end(image_id)
+        try:
+            os.utime(self.path(image_id))
+        except FileNotFoundError:
+            pass
+
+    def _evict(self):
+        """Removes the least recently used images until we're within max_bytes, always keeping the newest."""
+        while self.total > self.max_bytes and len(self.sizes) > 1:
+            oldest, size = self.sizes.popitem(last=False)
+            self.total -= size
+            try:
+                os.remove(self.path(oldest))
+            except FileNotFoundError:
+                pass
+
+
+store = ImageStore(config['images']['directory'] or DEFAULT_DIRECTORY, config['images']['max_megabytes'] * 2**20)
+"""Every process uses this one store; see the [images] section of configspec.ini."""
@@ -0,0 +1,187 @@
+"""
+A persistent SQLite index of the characters in our Obsidian Portal campaign.
+
+Scraping every page of our campaign's character listing takes a long time,
+so rather than doing that whenever we want to know which characters exist,
+we keep what we've scraped here along with when we last saw each character.
+The op module keeps this up to date (see op.refresh_characters), and lookups
+like finding every character with a tag are indexed queries.
+
+Each process opens its own connection, which is shared by all of its threads
+under a lock; the database is in WAL mode so that e.g. the website and the
+orgchart script can use it at the same time.  The index remembers which
+campaign it was scraped from, and starts over empty if we open it for a
+different campaign_url.
+"""
+import os
+import json
+import sqlite3
+import hashlib
+from time import time
+from threading import Lock
+
+from chargen import config, CONFIG_FILES
+
+FIELDS = ('slug', 'name', 'tags', 'description', 'avatar_url')
+"""The values we scrape for each character; these are the keys of our dicts, along with last_seen."""
+
+SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS characters (
+        slug TEXT PRIMARY KEY,
+        name TEXT NOT NULL,
+        tags TEXT NOT NULL,  -- a JSON list, in the order Obsidian Portal lists them
+        description TEXT NOT NULL,
+        avatar_url TEXT NOT NULL,
+        last_seen REAL NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS tags (
+        tag TEXT NOT NULL,  -- lowercased, since we match tags case-insensitively
+        slug TEXT NOT NULL REFERENCES characters(slug) ON DELETE CASCADE,
+        PRIMARY KEY (tag, slug)
+    ) WITHOUT ROWID;
+    CREATE INDEX IF NOT EXISTS tags_by_slug ON tags(slug);
+    CREATE TABLE IF NOT EXISTS refreshes (
+        kind TEXT PRIMARY KEY,
+        finished REAL NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS snapshots (
+        url TEXT PRIMARY KEY,
+        etag TEXT NOT NULL,
+        last_modified TEXT NOT NULL,
+        digest TEXT NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS meta (
+        key TEXT PRIMARY KEY,
+        value TEXT NOT NULL
+    );
+'''
+
+
+def default_path(campaign_url: str) -> str:
+    """
+    Returns where we keep the index for the given campaign if our config
+    doesn't give a path, which is next to our ini files with a hash of the
+    campaign URL in the filename, so that each campaign gets its own index.
+    """
+    digest = hashlib.sha1(campaign_url.encode('utf-8')).hexdigest()[:12]
+    return os.path.join(os.path.dirname(CONFIG_FILES[1]), f'characters-{digest}.sqlite3')
+
+
+class CharacterIndex:
+    def __init__(self, path: str, campaign_url: str):
+        self.path = path
+        self.campaign_url = campaign_url
+        self.lock = Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.db.row_factory = sqlite3.Row
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA foreign_keys=ON')
+        self.db.executescript(SCHEMA)
+        with self.db:
+            self.db.execute('BEGIN IMMEDIATE')
+            row = self.db.execute("SELECT value FROM meta WHERE key = 'campaign_url'").fetchone()
+            if not row or row[0] != campaign_url:
+                for table in ['characters', 'refreshes', 'snapshots']:  # tags are deleted along with their characters
+                    self.db.execute(f'DELETE FROM {table}')
+                self.db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('campaign_url', ?)", (campaign_url,))
+
+    @staticmethod
+    def _to_dict(row: sqlite3.Row) -> dict:
+        return dict(row, tags=json.loads(row['tags']))
+
+    def _select(self, where: str = '', params: tuple = ()) -> list[dict]:
+        with self.lock:
+            rows = self.db.execute(f'SELECT * FROM characters {where} ORDER BY name, slug', params).fetchall()
+        return [self._to_dict(row) for row in rows]
+
+    def characters(self) -> list[dict]:
+        """Returns every character we know of, sorted by name."""
+        return self._select()
+
+    def names(self) -> list[str]:
+        with self.lock:
+            return [name for (name,) in self.db.execute('SELECT name FROM characters')]
+
+    def by_tag(self, tag: str) -> list[dict]:
+        """Returns every character with the given tag (ignoring case), sorted by name."""
+        return self._select('WHERE slug IN (SELECT slug FROM tags WHERE tag = ?)', (tag.lower(),))
+
+    def __len__(self) -> int:
+        with self.lock:
+            return self.db.execute('SELECT COUNT(*) FROM characters').fetchone()[0]
+
+    def update(self, characters: list[dict], seen: float = None) -> list[str]:
+        """
+        Adds or updates the given scraped characters, marking them all as seen
+        at the given time (or now), and returns the slugs of the ones which
+        are new or have changed since we last saw them.
+        """
+        seen = seen or time()
+        changed = []
+        with self.lock, self.db:  # commits our transaction, or rolls it back if anything raises
+            self.db.execute('BEGIN')
+            for character in characters:
+                values = dict(character, tags=json.dumps(character['tags']))
+                row = self.db.execute('SELECT * FROM characters WHERE slug = ?', (character['slug'],)).fetchone()
+                if row and all(row[field] == values[field] for field in FIELDS):
+                    self.db.execute('UPDATE characters SET last_seen = ? WHERE slug = ?', (seen, character['slug']))
+                    continue
+
+                changed.append(character['slug'])
+                self.db.execute(
+                    'INSERT OR REPLACE INTO characters (slug, name, tags, description, avatar_url, last_seen) VALUES (?, ?, ?, ?, ?, ?)',
+                    tuple(values[field] for field in FIELDS) + (seen,))
+                self.db.execute('DELETE FROM tags WHERE slug = ?', (character['slug'],))
+                self.db.executemany(
+                    'INSERT OR IGNORE INTO tags (tag, slug) VALUES (?, ?)',
+                    [(tag.lower(), character['slug']) for tag in character['tags']])
+        return changed
+
+    def remove_unseen(self, since: float) -> int:
+        """Removes every character we haven't seen since the given time, returning how many we removed."""
+        with self.lock:
+            return self.db.execute('DELETE FROM characters WHERE last_seen < ?', (since,)).rowcount
+
+    def last_refresh(self, kind: str) -> float:
+        """Returns when we last finished a refresh of the given kind, or 0 if we never have."""
+        with self.lock:
+            row = self.db.execute('SELECT finished FROM refreshes WHERE kind = ?', (kind,)).fetchone()
+        return row[0] if row else 0
+
+    def refreshed(self, kind: str, finished: float = None):
+        with self.lock:
+            self.db.execute('INSERT OR REPLACE INTO refreshes (kind, finished) VALUES (?, ?)', (kind, finished or time()))
+
+    def snapshot(self, url: str) -> dict:
+        """
+        Returns the snapshot of a listing page from the last time we scraped it
+        into this index (see op._scrape_characters_page), or None if we haven't.
+        """
+        with self.lock:
+            row = self.db.execute('SELECT etag, last_modified, digest FROM snapshots WHERE url = ?', (url,)).fetchone()
+        return dict(row) if row else None
+
+    def save_snapshot(self, url: str, snapshot: dict):
+        with self.lock:
+            self.db.execute(
+                'INSERT OR REPLACE INTO snapshots (url, etag, last_modified, digest) VALUES (?, ?, ?, ?)',
+                (url, snapshot['etag'], snapshot['last_modified'], snapshot['digest']))
+
+
+_store = None
+_store_lock = Lock()
+
+
+def store() -> CharacterIndex:
+    """
+    Returns the one index which every process uses (see the [character_index]
+    section of configspec.ini), which we only open the first time it's needed
+    so that merely importing chargen never creates the database.
+    """
+    global _store
+    with _store_lock:
+        if _store is None:
+            campaign_url = config['campaign_url']
+            _store = CharacterIndex(config['character_index']['path'] or default_path(campaign_url), campaign_url)
+        return _store
@@ -0,0 +1,99 @@
+"""
+Background jobs for slow work like art generation.
+
+Generating a portrait takes many seconds (the Imagen call plus trimming and
+face detection), and if we did that inside a request handler then a few GMs
+generating art at once could tie up every CherryPy worker thread.  Instead we
+submit the work to a JobQueue, which runs it on its own bounded pool of
+threads, and the frontend polls (or long-polls) for the result.
+"""
+import uuid
+from time import time
+from threading import Event, Lock
+from concurrent.futures import ThreadPoolExecutor
+
+import cherrypy
+
+
+class QueueFull(Exception):
+    """Raised when submitting a job to a queue which already has too many."""
+
+
+class Job:
+    def __init__(self):
+        self.id = uuid.uuid4().hex
+        self.status = 'queued'
+        self.result = None
+        self.error = None
+        self.created = time()
+        self.finished = None
+        self.done = Event()
+
+    def to_dict(self) -> dict:
+        return {
+            'id': self.id,
+            'status': self.status,
+            'result': self.result,
+            'error': self.error,
+        }
+
+
+class JobQueue:
+    """
+    Runs func(*args) for each submitted job on a pool of at most `workers`
+    threads, with at most `queue_depth` more jobs waiting for a free thread;
+    beyond that submit() raises QueueFull rather than letting the backlog grow
+    without bound.  Finished jobs are kept for `keep_seconds` so that clients
+    can collect their results.
+    """
+    def __init__(self, func, workers: int, queue_depth: int, keep_seconds: int):
+        self.func = func
+        self.capacity = workers + queue_depth
+        self.keep_seconds = keep_seconds
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='job')
+        self.jobs = {}
+        self.lock = Lock()
+
+    def _pending(self) -> int:
+        return sum(1 for job in self.jobs.values() if not job.done.is_set())
+
+    def _expire(self):
+        cutoff = time() - self.keep_seconds
+        for job_id in [job.id for job in self.jobs.values() if job.finished and job.finished < cutoff]:
+            del self.jobs[job_id]
+
+    def submit(self, *args) -> Job:
+        with self.lock:
+            self._expire()
+            if self._pending() >= self.capacity:
+                raise QueueFull(f'There are already {self.capacity} jobs in progress; try again shortly.')
+            job = Job()
+            self.jobs[job.id] = job
+        self.executor.submit(self._run, job, args)
+        return job
+
+    def _run(self, job: Job, args: tuple):
+        job.status = 'running'
+        try:
+            job.result = self.func(*args)
+            job.status = 'done'
+        except Exception as e:
+            cherrypy.log(f'Job {job.id} failed: {e}', traceback=True)
+            job.error = str(e)
+            job.status = 'failed'
+        finally:
+            job.finished = time()
+            job.done.set()
+
+    def get(self, job_id: str, wait: float = 0) -> Job:
+        """
+        Returns the job with the given id (or None if there's no such job),
+        first waiting up to `wait` seconds for it to finish if it hasn't.
+        """
+        job = self.jobs.get(job_id)
+        if job and wait:
+            job.done.wait(wait)
+        return job
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
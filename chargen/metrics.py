@@ -0,0 +1,157 @@
+"""
+Latency histograms and error counters, which we serve at /metrics in the
+Prometheus text format so they can be scraped and graphed.
+
+We track two kinds of things:
+- every request to our website, labeled by endpoint, including the time
+  spent streaming the response body for our streaming endpoints
+- every call to the functions decorated with @timed, i.e. the slow calls we
+  make to Obsidian Portal and Imagen and our image processing, labeled by
+  module and function name, e.g. "op.create_character"
+
+We also count the requests to Obsidian Portal which op.Client retries.
+
+Each labeled histogram and counter has its own lock, so recording a metric
+only ever contends with other threads recording that same metric.
+"""
+from bisect import bisect_left
+from functools import wraps
+from threading import Lock
+from time import perf_counter
+
+import cherrypy
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+"""Upper bounds in seconds of our histogram buckets, which range from a cached page to an Imagen call."""
+
+
+class Histogram:
+    def __init__(self, buckets: tuple = BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # the last bucket is +Inf
+        self.sum = 0.0
+        self.lock = Lock()
+
+    def observe(self, seconds: float):
+        i = bisect_left(self.buckets, seconds)
+        with self.lock:
+            self.counts[i] += 1
+            self.sum += seconds
+
+    def samples(self, name: str, labels: str) -> list[str]:
+        with self.lock:
+            counts, total = list(self.counts), self.sum
+        lines, cumulative = [], 0
+        for bound, count in zip(self.buckets + ('+Inf',), counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{labels}{"," if labels else ""}le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_sum{{{labels}}} {total}')
+        lines.append(f'{name}_count{{{labels}}} {cumulative}')
+        return lines
+
+
+class Counter:
+    def __init__(self):
+        self.value = 0
+        self.lock = Lock()
+
+    def inc(self, amount: int = 1):
+        with self.lock:
+            self.value += amount
+
+    def samples(self, name: str, labels: str) -> list[str]:
+        return [f'{name}{{{labels}}} {self.value}']
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+
+class Metric:
+    """
+    A named metric with one Histogram or Counter for each combination of
+    label values, e.g. one latency histogram per endpoint.
+    """
+    def __init__(self, name: str, help: str, kind: type, labelnames: tuple):
+        self.name = name
+        self.help = help
+        self.kind = kind
+        self.labelnames = labelnames
+        self.children = {}
+        self.lock = Lock()
+
+    def labels(self, *values):
+        child = self.children.get(values)
+        if child is None:
+            with self.lock:
+                child = self.children.setdefault(values, self.kind())
+        return child
+
+    def render(self) -> list[str]:
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} {self.kind.__name__.lower()}']
+        with self.lock:
+            children = sorted(self.children.items())
+        for values, child in children:
+            labels = ','.join(f'{name}="{_escape(value)}"' for name, value in zip(self.labelnames, values))
+            lines.extend(child.samples(self.name, labels))
+        return lines
+
+
+REQUEST_SECONDS = Metric('chargen_request_duration_seconds', 'Time spent handling requests, by endpoint.', Histogram, ('endpoint',))
+REQUEST_ERRORS = Metric('chargen_request_errors_total', 'Requests with an error status, by endpoint and status.', Counter, ('endpoint', 'status'))
+CALL_SECONDS = Metric('chargen_call_duration_seconds', 'Time spent in instrumented functions, by function.', Histogram, ('function',))
+CALL_ERRORS = Metric('chargen_call_errors_total', 'Exceptions raised by instrumented functions, by function and exception.', Counter, ('function', 'error'))
+RETRIES = Metric('chargen_op_retries_total', 'Retried requests to Obsidian Portal, by kind of request and reason.', Counter, ('kind', 'reason'))
+
+METRICS = [REQUEST_SECONDS, REQUEST_ERRORS, CALL_SECONDS, CALL_ERRORS, RETRIES]
+
+
+def timed(func):
+    """
+    Decorator which records the latency of every call to func and counts the
+    exceptions it raises (which are still raised as usual).
+    """
+    function = f'{func.__module__.split(".")[-1]}.{func.__name__}'
+    histogram = CALL_SECONDS.labels(function)
+
+    @wraps(func)
+    def wrapped(*args, **kwargs):
+        start = perf_counter()
+        try:
+            return func(*args, **kwargs)
+        except Exception as e:
+            CALL_ERRORS.labels(function, type(e).__name__).inc()
+            raise
+        finally:
+            histogram.observe(perf_counter() - start)
+    return wrapped
+
+
+def start_request():
+    """
+    This is our CherryPy tool, which runs as each request starts and records
+    the request once the response (including any streamed body) is finished.
+    """
+    cherrypy.request.metrics_start = perf_counter()
+    cherrypy.request.hooks.attach('on_end_request', end_request)
+
+
+def end_request():
+    request, response = cherrypy.request, cherrypy.response
+    handler = request.handler
+    while hasattr(handler, 'oldhandler'):  # tools like encode wrap the page handler
+        handler = handler.oldhandler
+    # requests which don't match any of our endpoints all count as "unknown"
+    endpoint = getattr(getattr(handler, 'callable', None), '__name__', 'unknown')
+    REQUEST_SECONDS.labels(endpoint).observe(perf_counter() - request.metrics_start)
+    status = int(str(response.status).split()[0])
+    if status >= 400:
+        REQUEST_ERRORS.labels(endpoint, str(status)).inc()
+
+
+cherrypy.tools.metrics = cherrypy.Tool('on_start_resource', start_request)
+
+
+def render() -> str:
+    """Returns all of our metrics in the Prometheus text exposition format."""
+    return ''.join(line + '\n' for metric in METRICS for line in metric.render())
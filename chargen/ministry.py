@@ -5,74 +5,43 @@ This module provides functions to generate ministers with appropriate
 ranks, tags, and descriptions for each of the six ministries of Rokugan.
 """
 
-from chargen.character import Samurai
 from chargen import constants as c
+from chargen.roster import generate_roster
 
 
-def generate_minister(ministry_name, rank, clan=None, family=None, house=None):
+def generate_ministry_roster(rank, clan=None, family=None, house=None, seed=None, names=None):
     """
-    Generate a minister character with ministry-specific attributes.
-
-    Args:
-        ministry_name: One of the six ministries from c.MINISTRIES
-        rank: Base rank (6=Deputy Provincial, 7=Provincial, 9=Deputy, 10=Minister)
-        clan: Optional clan selection
-        family: Optional family selection
-        house: Optional house selection
-
-    Returns:
-        dict: Character data with ministry-specific tags and description
-    """
-    # Generate base samurai character
-    character = Samurai(
-        base_rank=rank,
-        clan=clan,
-        family=family,
-        house=house
-    )
-
-    # Get rank display name from config
-    rank_names = {
-        6: 'Deputy Provincial Minister',
-        7: 'Provincial Minister',
-        9: 'Deputy Minister',
-        10: 'Minister'
-    }
-    rank_display = rank_names.get(rank, 'Minister')
-
-    # Convert to dict
-    char_dict = character.to_dict()
-
-    # Add ministry-specific tag (rank tag is already added by Samurai.gen_tags())
-    ministry_tag = ministry_name
-    char_dict['tags'].append(ministry_tag)
-
-    # Add summary suggestion (user should edit this)
-    ministry_title = ministry_name.replace('Ministry of ', '')
-    char_dict['summary'] = f'{rank_display} of {ministry_title}'
-
-    # Store ministry metadata
-    char_dict['ministry'] = ministry_name
-    char_dict['ministry_rank'] = rank_display
-
-    return char_dict
-
-
-def generate_ministry_roster(rank, clan=None, family=None, house=None):
-    """
-    Generate a complete roster of 6 ministers, one for each ministry.
+    Generate a complete roster of 6 ministers, one for each ministry.  This is
+    just a roster spec with one position per ministry (see the roster module),
+    so the ministers are generated together and never share a personal name.
 
     Args:
         rank: Base rank for all ministers
         clan: Optional clan for all ministers
         family: Optional family for all ministers
         house: Optional house for all ministers
+        seed: Optional roster seed, so the same seed regenerates the same roster
+        names: Optional names object to pick the ministers' names from, e.g. a NameLeases
 
     Returns:
         list: List of 6 character dicts, one per ministry
     """
-    roster = []
-    for ministry in c.MINISTRIES:
-        minister = generate_minister(ministry, rank, clan, family, house)
-        roster.append(minister)
+    ministries = {ministry.replace('Ministry of ', ''): ministry for ministry in c.MINISTRIES}
+    spec = {
+        'ministers': {
+            'rank': rank,
+            'clan': clan or '',
+            'family': family or '',
+            'house': house or '',
+            'ministry': list(ministries),
+        }
+    }
+    roster = generate_roster(spec, seed=seed, names=names)
+    for minister in roster:
+        ministry_title = minister['position']['ministry']
+        rank_display = minister['position']['rank_title'] or 'Minister'
+        minister['tags'].append(ministries[ministry_title])
+        minister['summary'] = f'{rank_display} of {ministry_title}'
+        minister['ministry'] = ministries[ministry_title]
+        minister['ministry_rank'] = rank_display
     return roster
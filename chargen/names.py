@@ -0,0 +1,375 @@
+"""
+Bookkeeping for which personal names are still free to use in our campaign.
+
+We never want to give two characters the same personal name, so we track
+every name already in Obsidian Portal.  Rather than repeatedly picking random
+names until we find an unused one (which gets slower as the campaign fills
+up and never finishes once every name is taken), we keep a pool of the free
+names for each gender and remove names from it as they get used.
+
+A name is only used once its character is uploaded, but several GMs may be
+generating characters at once, so a generated character can also lease its
+name for a while (see NameLeases).  A leased name isn't free, so nobody else
+gets it; uploading the character makes the name permanently used, and if the
+lease expires first then the name goes back into the free pool.
+"""
+import heapq
+import random
+from time import time
+from random import Random
+from threading import Lock
+
+import numpy as np
+
+FOREVER = float('inf')
+
+
+class _Leases:
+    """
+    The expiration time of every leased name.  Some names are both male and
+    female names, so this is shared by the pools of every gender and is what
+    actually decides who gets a name: a pool only hands out a name once it has
+    claimed it here.  Each name is guarded by one of several striped locks, so
+    claims on different names rarely wait on each other.
+    """
+    def __init__(self, used: set, stripes: int = 16):
+        self.used = used
+        self.locks = [Lock() for _ in range(stripes)]
+        self.expirations = {}
+
+    def _lock(self, name: str) -> Lock:
+        return self.locks[hash(name) % len(self.locks)]
+
+    def expiration(self, name: str) -> float:
+        """Returns when the lease on a name expires, or 0 if it isn't leased."""
+        expires = self.expirations.get(name, 0)
+        return expires if expires > time() else 0
+
+    def claim(self, name: str, expires: float) -> bool:
+        """Leases a name until the given time if it's neither used nor leased, returning whether we did."""
+        with self._lock(name):
+            if name in self.used or self.expiration(name):
+                return False
+            self.expirations[name] = expires
+            return True
+
+    def end(self, name: str, expires: float = None):
+        """Ends the lease on a name (or only the lease with the given expiration)."""
+        with self._lock(name):
+            if expires is None or self.expirations.get(name) == expires:
+                self.expirations.pop(name, None)
+
+
+class _Pool:
+    """
+    The free names of one gender.  Each pool has its own lock, which is only
+    held for the O(1) or O(log n) bookkeeping of a pick, so generating
+    characters never waits on anything but other picks of the same gender.
+
+    Each pick makes exactly one draw from the rng however many unavailable
+    names it passes over (taking whichever name is swapped into the place of
+    each one we remove), so the rest of a seeded character is always
+    generated from the same rng state.
+    """
+    def __init__(self, gender: str, names: dict, used: set, leases: _Leases):
+        self.gender = gender
+        self.names = names
+        self.used = used
+        self.leases = leases
+        self.lock = Lock()
+        self.free = list(names)
+        self.positions = {name: i for i, name in enumerate(self.free)}
+        self.unavailable = []  # heap of (expiration time, name) for leased names to return to the pool
+
+    def _remove(self, name: str):
+        """Swap-removes a name from the free list."""
+        i = self.positions.pop(name, None)
+        if i is not None:
+            last = self.free.pop()
+            if i < len(self.free):
+                self.free[i] = last
+                self.positions[last] = i
+
+    def _append(self, name: str):
+        if name in self.names and name not in self.positions and name not in self.used and not self.leases.expiration(name):
+            self.positions[name] = len(self.free)
+            self.free.append(name)
+
+    def _hold(self, name: str, expires: float):
+        """Removes a leased name from the free list until its lease expires."""
+        self._remove(name)
+        if expires != FOREVER:
+            heapq.heappush(self.unavailable, (expires, name))
+
+    def _expire(self):
+        """Returns every name whose lease has expired to the free list."""
+        now = time()
+        while self.unavailable and self.unavailable[0][0] <= now:
+            expires, name = heapq.heappop(self.unavailable)
+            self.leases.end(name, expires)
+            self._append(name)
+
+    def _check(self, n: int = 1):
+        if len(self.free) < n:
+            raise ValueError(
+                f'Only {len(self.free)} of our {len(self.names)} {self.gender} names are unused in this campaign '
+                f'(and not leased by characters being generated), so we cannot pick {n}; '
+                f'add more names to {self.gender}_names.txt'
+            )
+
+    def _available(self, name: str) -> bool:
+        """
+        Names in our free list may have just been leased by the pool of another
+        gender, in which case we remove them and return False.
+        """
+        expires = self.leases.expiration(name)
+        if expires:
+            self._hold(name, expires)
+        return not expires
+
+    def hold(self, name: str, expires: float):
+        """Called when another pool leases a name which is also one of ours."""
+        with self.lock:
+            self._hold(name, expires)
+
+    def take(self, name: str):
+        """Removes a newly used name from the free list."""
+        with self.lock:
+            self._remove(name)
+
+    def release(self, name: str):
+        """Returns a name which is no longer used to the free list unless it's leased."""
+        with self.lock:
+            self._append(name)
+
+    def count(self) -> int:
+        with self.lock:
+            self._expire()
+            return len(self.free)
+
+    def _claim(self, name: str, expires: float) -> bool:
+        """
+        Leases one of our free names if we can, and otherwise removes it from
+        our free list if it's just been used or leased by the pool of another
+        gender (if it was neither by the time we looked, we can try again).
+        """
+        if self.leases.claim(name, expires):
+            self._hold(name, expires)
+            return True
+        if name in self.used:
+            self._remove(name)
+        else:
+            self._available(name)
+        return False
+
+    def choose(self, rng: Random) -> str:
+        with self.lock:
+            self._expire()
+            self._check()
+            i = rng.randrange(len(self.free))
+            while True:
+                self._check()
+                name = self.free[i % len(self.free)]
+                if self._available(name):
+                    return name
+
+    def choose_many(self, n: int, rng: np.random.Generator) -> list[str]:
+        with self.lock:
+            self._expire()
+            if n:
+                self._check()
+            return [self.free[i] for i in rng.integers(len(self.free), size=n)]
+
+    def lease(self, rng: Random, expires: float) -> str:
+        """Like choose(), except that the name is leased until the given time."""
+        with self.lock:
+            self._expire()
+            self._check()
+            i = rng.randrange(len(self.free))
+            while True:
+                self._check()
+                name = self.free[i % len(self.free)]
+                if self._claim(name, expires):
+                    return name
+
+    def lease_many(self, n: int, rng: np.random.Generator, expires: float) -> list[str]:
+        """Leases n different random names until the given time."""
+        with self.lock:
+            self._expire()
+            self._check(n)
+            leased = []
+            for roll in rng.random(n):
+                while True:
+                    self._check(n - len(leased))
+                    name = self.free[int(roll * len(self.free))]
+                    if self._claim(name, expires):
+                        leased.append(name)
+                        break
+            return leased
+
+
+class UsedNames(set):
+    """
+    This is the set of personal names (e.g. 'Gohei' instead of 'Matsu Gohei')
+    already used in our campaign, which also maintains a free pool of unused
+    names for each gender.  Adding a name to the set removes it from the free
+    pool with a swap-remove, and discarding a name returns it to the pool, so
+    everything which updates the set (e.g. the op module) keeps the pools in
+    sync without knowing about them, and picking a free name is O(1).
+    """
+    def __init__(self, names: dict[str, dict]):
+        super().__init__()
+        self._names = names
+        self._leases = _Leases(self)
+        self._pools = {gender: _Pool(gender, gender_names, self, self._leases) for gender, gender_names in names.items()}
+
+    def add(self, name: str):
+        super().add(name)
+        self._leases.end(name)
+        for pool in self._pools.values():
+            pool.take(name)
+
+    def update(self, *iterables):
+        for iterable in iterables:
+            for name in iterable:
+                self.add(name)
+
+    def __ior__(self, other):
+        self.update(other)
+        return self
+
+    def discard(self, name: str):
+        if name in self:
+            super().discard(name)
+            for pool in self._pools.values():
+                pool.release(name)
+
+    def remove(self, name: str):
+        if name not in self:
+            raise KeyError(name)
+        self.discard(name)
+
+    def clear(self):
+        for name in list(self):
+            self.discard(name)
+
+    def free_count(self, gender: str) -> int:
+        """Returns how many names of the given gender are neither used nor leased."""
+        return self._pools[gender].count()
+
+    def unused(self, gender: str) -> list[str]:
+        """Returns every name of the given gender which isn't used, whether or not it's leased."""
+        return [name for name in self._names[gender] if name not in self]
+
+    def choose(self, gender: str, rng: Random = None) -> str:
+        """Returns a random free name of the given gender."""
+        return self._pools[gender].choose(rng or random)
+
+    def choose_many(self, gender: str, n: int, rng: np.random.Generator) -> list[str]:
+        """
+        Batch version of choose(), returning n independent picks from the
+        free names of the given gender.
+        """
+        return self._pools[gender].choose_many(n, rng)
+
+    def _leased(self, gender: str, names: list[str], expires: float):
+        """Removes names just leased from the pool of one gender from the pools of the others."""
+        for other, pool in self._pools.items():
+            if other != gender:
+                for name in names:
+                    if name in pool.names:
+                        pool.hold(name, expires)
+
+    def lease(self, gender: str, rng: Random, seconds: float) -> str:
+        """
+        Leases a random free name of the given gender for the given number of
+        seconds, after which it goes back into the free pool unless it's been
+        added to this set.  This uses the rng exactly as choose() does, so a
+        seeded character generates the same way whether or not it leases.
+        """
+        expires = time() + seconds
+        name = self._pools[gender].lease(rng, expires)
+        self._leased(gender, [name], expires)
+        return name
+
+    def lease_many(self, gender: str, n: int, rng: np.random.Generator, seconds: float) -> list[str]:
+        """Like lease(), except that this leases n different names."""
+        expires = time() + seconds
+        names = self._pools[gender].lease_many(n, rng, expires)
+        self._leased(gender, names, expires)
+        return names
+
+    def reserve_many(self, gender: str, n: int, rng: np.random.Generator) -> list[str]:
+        """
+        Like choose_many(), except that the n names are all different and are
+        added to this set, so nobody else can pick them until they're discarded.
+        """
+        reserved = self._pools[gender].lease_many(n, rng, FOREVER)
+        self.update(reserved)
+        return reserved
+
+
+class NameLeases:
+    """
+    This can be passed as the names argument of our character constructors
+    and Character.batch(), so that every character leases its name from a set
+    of used names for the given number of seconds rather than just picking a
+    free name, and no two characters generated at the same time share a name.
+
+    We make one of these for each request, which leases at most limit names.
+    Past that, or once there are no free names left to lease, we fall back to
+    picking names which are unused but may be leased by someone else, so one
+    big request can't lease every name and nobody ever runs out of names.  The
+    characters of one request still never share a name either way.
+    """
+    def __init__(self, used_names: UsedNames, seconds: float, limit: float = FOREVER):
+        self.used_names = used_names
+        self.seconds = seconds
+        self.remaining = limit
+        self.picked = set()
+
+    def _unleased(self, gender: str, n: int) -> list[str]:
+        """Returns the unused names of the given gender which we haven't picked, if there are at least n."""
+        candidates = [name for name in self.used_names.unused(gender) if name not in self.picked]
+        if len(candidates) < n:
+            raise ValueError(
+                f'Only {len(candidates)} of our {gender} names are unused in this campaign (and not already picked '
+                f'for these characters), so we cannot pick {n}; '
+                f'add more names to {gender}_names.txt'
+            )
+        return candidates
+
+    def choose(self, gender: str, rng: Random = None) -> str:
+        rng = rng or random
+        if self.remaining >= 1:
+            try:
+                name = self.used_names.lease(gender, rng, self.seconds)
+            except ValueError:
+                self.remaining = 0  # every free name is leased, so we stop trying
+            else:
+                self.remaining -= 1
+                self.picked.add(name)
+                return name
+
+        candidates = self._unleased(gender, 1)
+        name = candidates[rng.randrange(len(candidates))]
+        self.picked.add(name)
+        return name
+
+    def choose_many(self, gender: str, n: int, rng: np.random.Generator) -> list[str]:
+        leased = []
+        if self.remaining >= 1:
+            try:
+                leased = self.used_names.lease_many(gender, min(n, self.remaining), rng, self.seconds)
+            except ValueError:
+                self.remaining = 0
+            else:
+                self.remaining -= len(leased)
+                self.picked.update(leased)
+        if len(leased) == n:
+            return leased
+
+        candidates = self._unleased(gender, n - len(leased))
+        picks = [candidates[i] for i in rng.choice(len(candidates), n - len(leased), replace=False)]
+        self.picked.update(picks)
+        return leased + picks
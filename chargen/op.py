@@ -28,15 +28,30 @@ To set up the browser session approach:
    - The authenticity_token from the page source (search for csrf-token)
 """
 import re
-from time import sleep
-from threading import Thread
+import json
+import hashlib
+from time import time, sleep
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+from http.cookiejar import DefaultCookiePolicy
+from threading import Event, Lock, Thread
+from concurrent.futures import ThreadPoolExecutor
 
 import cherrypy
 import requests
-from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+from bs4 import BeautifulSoup, SoupStrainer
 
-from chargen import config
+try:
+    import lxml.html
+    from lxml.etree import XPath
+except ImportError:
+    lxml = None
+
+from chargen import config, index
 from chargen import constants as c
+from chargen.metrics import RETRIES, timed
+from chargen.ratelimit import TokenBucket, backoff
 
 
 # =============================================================================
@@ -56,11 +71,8 @@ def _get_campaign_base_url():
     return campaign_url.rstrip('/')
 
 
-def _get_browser_session():
-    """
-    Create a requests session that mimics a browser with the configured
-    session cookie.
-    """
+def _get_session_cookie():
+    """Get the browser session cookie from config."""
     op_config = config.get('obsidian_portal', {})
     session_cookie = op_config.get('session_cookie', '')
 
@@ -71,14 +83,33 @@ def _get_browser_session():
             'See the module docstring for instructions.'
         )
 
-    campaign_url = _get_campaign_base_url()
+    return session_cookie
+
 
-    session = requests.Session()
-    session.headers.update({
+class Client:
+    """
+    A long-lived HTTP client which mimics a browser with the configured session
+    cookie.  We make every request to Obsidian Portal through the one instance
+    of this below, so that we reuse kept-alive connections from a pool of up to
+    pool_size connections rather than doing a new TLS handshake for every call.
+
+    This is shared by every CherryPy thread, our upload pipeline, and the
+    background name updater, so we never change its session after creating it;
+    anything which depends on our config or differs between requests (like our
+    cookie and the AJAX headers for uploads) is passed with each request.
+    When all pool_size connections are in use, further requests wait for one.
+
+    Every request is one of the kinds in RETRY_STATUSES, each of which has its
+    own TokenBucket (see the ratelimit module) limiting how fast we make that
+    kind of request, and we retry failed requests up to retries times with
+    jittered exponential backoff (or after the Retry-After that Obsidian
+    Portal gives us).  We retry scrapes and uploads after any server error or
+    connection failure, since repeating them is harmless (at worst we upload
+    an image twice), but only retry creating a character when Obsidian Portal
+    tells us it didn't do anything, so that we never create it twice.
+    """
+    BROWSER_HEADERS = {
         'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.9',
-        'Content-Type': 'application/x-www-form-urlencoded',
-        'Origin': campaign_url,
-        'Referer': f'{campaign_url}/characters/new',
         'sec-ch-ua': '"Not?A_Brand";v="8", "Chromium";v="108", "Google Chrome";v="108";',
         'sec-ch-ua-mobile': '?0',
         'sec-ch-ua-platform': '"Linux"',
@@ -88,10 +119,120 @@ def _get_browser_session():
         'sec-fetch-user': '?1',
         'upgrade-insecure-requests': '1',
         'User-Agent': 'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/108.0.0.0 Safari/537.36',
-        'Cookie': session_cookie,
-    })
+    }
+
+    AJAX_HEADERS = {
+        'Accept': 'application/json',
+        'X-Requested-With': 'XMLHttpRequest',
+    }
+
+    RETRY_STATUSES = {
+        'scrape': {429, 500, 502, 503, 504},
+        'upload': {429, 500, 502, 503, 504},
+        'create': {429, 503},
+    }
 
-    return session
+    def __init__(self, pool_size: int, limits: dict, retries: int, backoff_seconds: float, max_backoff_seconds: float):
+        self.buckets = {kind: TokenBucket(limits[kind]['rate'], limits[kind]['burst']) for kind in self.RETRY_STATUSES}
+        self.retries = retries
+        self.backoff_seconds = backoff_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, pool_block=True)
+        self.session = requests.Session()
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.session.headers.update(self.BROWSER_HEADERS)
+        self.session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))  # never shared between requests
+
+    def _headers(self, ajax: bool) -> dict:
+        campaign_url = _get_campaign_base_url()
+        headers = {
+            'Origin': campaign_url,
+            'Referer': f'{campaign_url}/characters/new',
+        }
+        if ajax:
+            headers.update(self.AJAX_HEADERS)
+        return headers
+
+    def _cookies(self) -> requests.cookies.RequestsCookieJar:
+        """
+        We send our session cookie with each request rather than keeping it in
+        the session's cookie jar, so each request (and the redirects it follows,
+        which get any cookies Obsidian Portal sets in place of ours) has its own
+        jar just as if we'd made a new session for it.
+        """
+        jar = requests.cookies.RequestsCookieJar()
+        domain = urlparse(_get_campaign_base_url()).hostname
+        for cookie in _get_session_cookie().split(';'):
+            if '=' in cookie:
+                name, value = cookie.strip().split('=', 1)
+                jar.set(name, value, domain=domain, path='/')
+        return jar
+
+    def _retry_after(self, response: requests.Response):
+        """Returns the seconds to wait from a response's Retry-After header, or None if it doesn't have one."""
+        value = response.headers.get('Retry-After', '').strip()
+        if value.isdigit():
+            return float(value)
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time())
+        except (TypeError, ValueError):
+            return None
+
+    def request(self, kind: str, method: str, url: str, **kwargs) -> requests.Response:
+        """
+        Makes a request of the given kind, waiting for our rate limit and
+        retrying as described above.  If we run out of retries then we return
+        the last response (or raise the last exception) as usual.
+        """
+        bucket, statuses = self.buckets[kind], self.RETRY_STATUSES[kind]
+        for attempt in range(self.retries + 1):
+            bucket.acquire()
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if kind == 'create' or attempt == self.retries:
+                    raise
+                reason, delay = type(e).__name__, None
+            else:
+                if response.status_code not in statuses or attempt == self.retries:
+                    return response
+                reason, delay = str(response.status_code), self._retry_after(response)
+
+            if delay is None:
+                delay = backoff(attempt, self.backoff_seconds, self.max_backoff_seconds)
+            delay = min(delay, self.max_backoff_seconds)
+            RETRIES.labels(kind, reason).inc()
+            cherrypy.log(f'Retrying {method} {url} in {delay:.1f} seconds after {reason}')
+            sleep(delay)
+
+    def get(self, url: str, headers: dict = None, **kwargs) -> requests.Response:
+        """GETs a page to scrape, sending any given headers (e.g. for a conditional GET) as well as ours."""
+        headers = dict(self._headers(ajax=False), **(headers or {}))
+        return self.request('scrape', 'GET', url, headers=headers, cookies=self._cookies(), **kwargs)
+
+    def post(self, url: str, *, kind: str, ajax: bool = False, **kwargs) -> requests.Response:
+        """
+        POSTs a request of the given kind ('create' or 'upload') to Obsidian
+        Portal as a form submission, or as an AJAX request expecting a JSON
+        response if ajax is True.  Requests sets the Content-Type for us,
+        including the boundary for multipart uploads.
+        """
+        return self.request(kind, 'POST', url, headers=self._headers(ajax), cookies=self._cookies(), **kwargs)
+
+    def close(self):
+        self.session.close()
+
+
+client = Client(
+    config['op_client']['pool_size'],
+    limits=config['op_client'],
+    retries=config['op_client']['retries'],
+    backoff_seconds=config['op_client']['backoff_seconds'],
+    max_backoff_seconds=config['op_client']['max_backoff_seconds'],
+)
+cherrypy.engine.subscribe('stop', client.close)
 
 
 def _get_authenticity_token():
@@ -109,6 +250,7 @@ def _get_authenticity_token():
     return token
 
 
+@timed
 def create_character(name, *, summary='', tags=None, description='', bio='', gm_info='', avatar_upload_id=''):
     """
     Create a character in Obsidian Portal by simulating browser form submission.
@@ -125,7 +267,6 @@ def create_character(name, *, summary='', tags=None, description='', bio='', gm_
     Returns:
         requests.Response: The response from the server
     """
-    session = _get_browser_session()
     campaign_url = _get_campaign_base_url()
     authenticity_token = _get_authenticity_token()
 
@@ -148,7 +289,7 @@ def create_character(name, *, summary='', tags=None, description='', bio='', gm_
         'new_avatar_upload_id': avatar_upload_id,
     }
 
-    response = session.post(f'{campaign_url}/characters', data=payload)
+    response = client.post(f'{campaign_url}/characters', kind='create', data=payload)
 
     if response.status_code == 200 and '/characters/' in response.url:
         # Success - we were redirected to the new character page
@@ -172,6 +313,7 @@ def create_character(name, *, summary='', tags=None, description='', bio='', gm_
     return response
 
 
+@timed
 def upload_image(image_data: bytes, filename: str) -> dict:
     """
     Upload an image to Obsidian Portal and return the file info.
@@ -194,25 +336,15 @@ def upload_image(image_data: bytes, filename: str) -> dict:
             'uploading an image manually.'
         )
 
-    session = _get_browser_session()
     campaign_url = _get_campaign_base_url()
 
     url = f'{campaign_url}/files?asset_folder_id={asset_folder_id}'
 
-    # Update headers for JSON response and AJAX request
-    session.headers.update({
-        'Accept': 'application/json',
-        'X-Requested-With': 'XMLHttpRequest',
-    })
-    # Remove Content-Type so requests can set it properly for multipart
-    if 'Content-Type' in session.headers:
-        del session.headers['Content-Type']
-
     files = {
         'file': (filename, image_data, 'image/png')
     }
 
-    response = session.post(url, files=files)
+    response = client.post(url, kind='upload', ajax=True, files=files)
 
     if response.status_code == 200:
         result = response.json()
@@ -232,6 +364,7 @@ def upload_image(image_data: bytes, filename: str) -> dict:
         response.raise_for_status()
 
 
+@timed
 def upload_avatar(image_data: bytes, filename: str) -> dict:
     """
     Upload an avatar/thumbnail image to Obsidian Portal.
@@ -244,20 +377,10 @@ def upload_avatar(image_data: bytes, filename: str) -> dict:
     Returns:
         dict: The response from the server containing 'id', 'filename', etc.
     """
-    session = _get_browser_session()
     campaign_url = _get_campaign_base_url()
 
     url = f'{campaign_url}/uploads'
 
-    # Update headers for JSON response and AJAX request
-    session.headers.update({
-        'Accept': 'application/json',
-        'X-Requested-With': 'XMLHttpRequest',
-    })
-    # Remove Content-Type so requests can set it properly for multipart
-    if 'Content-Type' in session.headers:
-        del session.headers['Content-Type']
-
     # Multipart form data with upload_type field
     files = {
         'file[0]': (filename, image_data, 'image/png')
@@ -266,7 +389,7 @@ def upload_avatar(image_data: bytes, filename: str) -> dict:
         'upload_type': 'character_avatar'
     }
 
-    response = session.post(url, files=files, data=data)
+    response = client.post(url, kind='upload', ajax=True, files=files, data=data)
 
     if response.status_code == 200:
         result = response.json()
@@ -286,92 +409,313 @@ def upload_avatar(image_data: bytes, filename: str) -> dict:
         response.raise_for_status()
 
 
-def _scrape_characters_page(session, url):
+MAX_PAGES = 100
+"""We never scrape more pages than this, in case the pagination links are ever broken."""
+
+HTML_PARSERS = ['lxml', 'html.parser'] if lxml else ['html.parser']
+"""The parsers we have for our listing pages, fastest first; html.parser is built into Python."""
+
+CHARACTER_LINK = re.compile(r'^/characters/[^/]+$')
+
+LINK = re.compile(r"""<a\s[^>]*>""", re.IGNORECASE)
+HREF = re.compile(r"""\bhref\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s>]+))""", re.IGNORECASE)
+REL_NEXT = re.compile(r"""\brel\s*=\s*(?:"(?:[^"]*\s)?next[\s"]|'(?:[^']*\s)?next[\s']|next[\s>])""", re.IGNORECASE)
+PAGE_LINK = re.compile(r'[?&](?:amp;)?page=(\d+)')
+
+
+def get_html_parser(name='auto'):
     """
-    Scrape a single characters listing page and return a list of dicts with
-    name, slug, tags, and description for each character on the page.
+    Returns the named parser, where 'auto' means the fastest one we have.
+    Raises a ValueError if the requested parser isn't installed.
     """
-    response = session.get(url)
-    if response.status_code != 200:
-        cherrypy.log(f'Failed to fetch characters page: {response.status_code}')
-        return [], False
+    if name == 'auto':
+        return HTML_PARSERS[0]
+    elif name not in HTML_PARSERS:
+        raise ValueError(f'The {name} HTML parser is not available; is {name} installed?')
+    return name
+
+
+HTML_PARSER = get_html_parser(config['op_client']['html_parser'])
+
+
+def _character(name, href, tags, description, avatar_url):
+    """Returns the dict for a character card, or None if the card isn't for a character."""
+    if not name or href.endswith('/new'):
+        return None
+    return {
+        'name': name,
+        'slug': href.split('/')[-1],
+        'tags': [tag for tag in tags if tag],
+        'description': description,
+        'avatar_url': avatar_url,
+    }
 
-    soup = BeautifulSoup(response.text, 'html.parser')
-    characters = []
 
+CHARACTER_CARDS = SoupStrainer('div', class_=re.compile(r'(^|\s)content-list-item(\s|$)'))
+"""
+Our character cards; with lxml a SoupStrainer sees the whole class attribute
+rather than each class, so we match content-list-item as one of them.
+"""
+
+
+def _soup_cards(html, strain=True):
+    """
+    Parses the character cards on a listing page with BeautifulSoup and
+    html.parser, by default only building the div.content-list-item subtrees.
+    """
+    soup = BeautifulSoup(html, 'html.parser', parse_only=CHARACTER_CARDS if strain else None)
+    characters = []
     for item in soup.find_all('div', class_='content-list-item'):
         card = item.find('div', class_='content-info')
-        if not card:
-            continue
-        name_tag = card.find('h4', class_='character-name')
-        if not name_tag:
-            continue
-        link = name_tag.find('a', href=re.compile(r'^/characters/[^/]+$'))
-        if not link or link['href'].endswith('/new'):
+        name_tag = card and card.find('h4', class_='character-name')
+        link = name_tag and name_tag.find('a', href=CHARACTER_LINK)
+        if not link:
             continue
 
-        name = link.get_text(strip=True)
-        if not name:
-            continue
-
-        slug = link['href'].split('/')[-1]
-        tags = [a['data-tag'] for a in card.find_all('a', class_='tag-link') if a.get('data-tag')]
+        tags = [a.get('data-tag') for a in card.find_all('a', class_='tag-link')]
         desc_div = card.find('div', class_='description-text')
-        description = desc_div.get('title', '') if desc_div else ''
-
         img = item.find('img', class_='game-content-image')
-        avatar_url = img['src'] if img and img.get('src') else ''
+        characters.append(_character(
+            link.get_text(strip=True),
+            link['href'],
+            tags,
+            desc_div.get('title', '') if desc_div else '',
+            img['src'] if img and img.get('src') else '',
+        ))
+    return [character for character in characters if character]
+
+
+if lxml:
+    def _has_class(name):
+        return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+    LXML_CARDS = XPath(f"//div[{_has_class('content-list-item')}]")
+    LXML_INFO = XPath(f"descendant::div[{_has_class('content-info')}][1]")
+    LXML_NAME = XPath(f"descendant::h4[{_has_class('character-name')}][1]")
+    LXML_LINKS = XPath('descendant::a[@href]')
+    LXML_TAGS = XPath(f"descendant::a[{_has_class('tag-link')}]/@data-tag")
+    LXML_DESCRIPTION = XPath(f"descendant::div[{_has_class('description-text')}][1]")
+    LXML_IMAGE = XPath(f"descendant::img[{_has_class('game-content-image')}][1]")
+
+
+def _lxml_cards(html):
+    """
+    Parses the character cards on a listing page with lxml and precompiled
+    XPath queries, which finds exactly what _soup_cards() does many times
+    faster, since lxml parses in C and we never build a BeautifulSoup tree.
+    """
+    characters = []
+    for item in LXML_CARDS(lxml.html.fromstring(html)):
+        card = LXML_INFO(item)
+        name_tag = card and LXML_NAME(card[0])
+        link = name_tag and next((a for a in LXML_LINKS(name_tag[0]) if CHARACTER_LINK.search(a.get('href'))), None)
+        if not name_tag or link is None:
+            continue
 
-        characters.append({
-            'name': name,
-            'slug': slug,
-            'tags': tags,
-            'description': description,
-            'avatar_url': avatar_url,
-        })
+        desc_div = LXML_DESCRIPTION(card[0])
+        img = LXML_IMAGE(item)
+        characters.append(_character(
+            ''.join(text.strip() for text in link.itertext()),  # like BeautifulSoup's get_text(strip=True)
+            link.get('href'),
+            LXML_TAGS(card[0]),
+            desc_div[0].get('title', '') if desc_div else '',
+            (img[0].get('src') or '') if img else '',
+        ))
+    return [character for character in characters if character]
 
-    has_next = soup.find('a', rel='next') is not None
-    return characters, has_next
 
+def _last_page(html, page):
+    """
+    Returns the last page number linked to from a listing page.  We find this
+    with regexes over the raw HTML rather than parsing the pagination links,
+    so that we only have to parse the character cards themselves.
+    """
+    last_page = page
+    for link in LINK.findall(html):
+        href = HREF.search(link)
+        match = href and PAGE_LINK.search(next(group for group in href.groups() if group is not None))
+        if match:
+            last_page = max(last_page, int(match.group(1)))
+        if REL_NEXT.search(link):
+            last_page = max(last_page, page + 1)
+    return last_page
+
+
+def parse_characters_page(html, page=1, parser=None):
+    """
+    Parses a characters listing page and returns a list of dicts with name,
+    slug, tags, description, and avatar_url for each character on the page,
+    along with the last page number in the page's pagination links.
+
+    We use the parser from [op_client] html_parser by default, which is lxml
+    if it's installed, and otherwise BeautifulSoup with html.parser, where we
+    only parse the character cards; both are much faster than parsing the
+    whole page with html.parser (see benchmarks/parsing.py).  If that finds
+    no characters on a page which has them (e.g. if Obsidian Portal changes
+    their markup in a way which our SoupStrainer or XPath queries can't
+    handle) then we fall back to parsing the whole page with html.parser.
+    """
+    characters = (_lxml_cards if (parser or HTML_PARSER) == 'lxml' else _soup_cards)(html)
+    if not characters and 'content-list-item' in html:
+        characters = _soup_cards(html, strain=False)
+    return characters, _last_page(html, page)
 
-def existing_characters():
+
+@timed
+def _scrape_characters_page(url, page=1, snapshot=None):
     """
-    Returns a list of dicts for all characters in the campaign, each containing
-    'name', 'slug', 'tags' (list of strings), and 'description'.
+    Scrape a single characters listing page and return a list of dicts with
+    name, slug, tags, and description for each character on the page, along
+    with the last page number in the page's pagination links and a snapshot
+    of the page: its ETag and Last-Modified headers (if it has them) and a
+    digest of what we scraped from it.
+
+    Given the snapshot from the last time we scraped the page, we make a
+    conditional GET, and if the page hasn't changed since then (because
+    Obsidian Portal says so or because we scraped the same thing from it) we
+    return None instead of the characters.
+    """
+    headers = {}
+    if snapshot and snapshot['etag']:
+        headers['If-None-Match'] = snapshot['etag']
+    if snapshot and snapshot['last_modified']:
+        headers['If-Modified-Since'] = snapshot['last_modified']
+
+    response = client.get(url, headers=headers)
+    if response.status_code == 304 and snapshot:
+        return None, page, snapshot
+    elif response.status_code != 200:
+        cherrypy.log(f'Failed to fetch characters page: {response.status_code}')
+        return [], page, None
+
+    characters, last_page = parse_characters_page(response.text, page)
+    scraped = json.dumps([characters, last_page], sort_keys=True).encode('UTF-8')
+    new_snapshot = {
+        'etag': response.headers.get('ETag', ''),
+        'last_modified': response.headers.get('Last-Modified', ''),
+        'digest': hashlib.sha256(scraped).hexdigest(),
+    }
+    if snapshot and snapshot['digest'] == new_snapshot['digest']:
+        return None, last_page, new_snapshot
+    return characters, last_page, new_snapshot
+
+
+def _listing_url(page):
+    """Returns the URL of the given page number of our campaign's character listing."""
+    url = f'{_get_campaign_base_url()}/characters'
+    if page > 1:
+        url += f'?page={page}'
+    return url
+
+
+def _scrape_listing_page(page):
+    return _scrape_characters_page(_listing_url(page), page)
 
-    Scrapes the campaign's /characters listing page which includes tags
-    and tagline for each character. Handles pagination.
+
+def _scrape_all_characters():
     """
-    try:
-        session = _get_browser_session()
-        campaign_url = _get_campaign_base_url()
-        all_characters = []
-        page = 1
+    Scrapes every page of our campaign's character listing, returning the
+    characters along with whether we got all of them and the snapshot of the
+    first page (see _scrape_characters_page).  We fetch the first
+    page to find out how many pages there are, and then fetch the rest of
+    them concurrently with up to [op_client] scrape_workers at once.  If the
+    last page we fetched links to even more pages (e.g. because characters
+    were added while we were scraping) then we fetch those too.
+    """
+    all_characters, first_snapshot = [], None
+    page, last_page = 0, 1  # the last page we've fetched, and the last page we know of
+    with ThreadPoolExecutor(config['op_client']['scrape_workers']) as pool:
+        while page < last_page:
+            if page >= MAX_PAGES:
+                cherrypy.log(f'Reached pagination limit of {MAX_PAGES} pages')
+                return all_characters, False, first_snapshot
+            pages = range(page + 1, min(last_page, MAX_PAGES) + 1)
+            results = list(pool.map(_scrape_listing_page, pages))
+            first_snapshot = first_snapshot or results[0][2]
+            for characters, _, _ in results:
+                if not characters:
+                    return all_characters, False, first_snapshot
+                all_characters.extend(characters)
+            page, last_page = pages[-1], max(last for _, last, _ in results)
 
-        while True:
-            url = f'{campaign_url}/characters'
-            if page > 1:
-                url += f'?page={page}'
+    return all_characters, True, first_snapshot
 
-            characters, has_next = _scrape_characters_page(session, url)
-            if not characters:
-                break
 
-            all_characters.extend(characters)
+_refresh_lock = Lock()
 
-            if not has_next:
-                break
 
+def refresh_characters(full=None):
+    """
+    Updates our character index (see the index module) from Obsidian Portal
+    and returns the slugs of the characters which are new or have changed.
+
+    A full refresh scrapes every page of our character listing and removes
+    characters which are no longer there.  Otherwise we make a conditional
+    GET for the first page, and stop right there if it hasn't changed since
+    the last time we scraped it, which is usually the case; if it has, then we
+    scrape one page at a time and stop at the first page whose characters we
+    already have unchanged, which relies on Obsidian Portal listing new and
+    recently edited characters first.  This can't notice deleted characters (or edits further
+    down the listing than that), so by default we do a full refresh
+    whenever it's been [character_index] full_refresh_hours since the last
+    one, and an incremental refresh otherwise.
+    """
+    with _refresh_lock:
+        store = index.store()
+        started = time()
+        if full is None:
+            hours = config['character_index']['full_refresh_hours']
+            full = not len(store) or started - store.last_refresh('full') > hours * 3600
+
+        first_url = _listing_url(1)
+        if full:
+            characters, complete, snapshot = _scrape_all_characters()
+            changed = store.update(characters, started)
+            if complete:
+                removed = store.remove_unseen(started)
+                store.save_snapshot(first_url, snapshot)
+                store.refreshed('full')
+                cherrypy.log(f'Refreshed all {len(characters)} characters: {len(changed)} new or changed, {removed} removed')
+            return changed
+
+        changed = []
+        page, last_page = 0, 1
+        while page < min(last_page, MAX_PAGES):
             page += 1
-            if page > 100:
-                cherrypy.log('Reached pagination limit of 100 pages')
+            if page == 1:
+                characters, last_page, snapshot = _scrape_characters_page(first_url, 1, store.snapshot(first_url))
+                if characters is None:
+                    store.save_snapshot(first_url, snapshot)
+                    break
+            else:
+                characters, last_page, _ = _scrape_listing_page(page)
+            page_changed = store.update(characters, started)
+            changed.extend(page_changed)
+            if page == 1 and snapshot:
+                store.save_snapshot(first_url, snapshot)
+            if not page_changed:
                 break
+        store.refreshed('incremental')
+        return changed
 
-        return all_characters
 
+def existing_characters():
+    """
+    Returns a list of dicts for all characters in the campaign, each containing
+    'name', 'slug', 'tags' (list of strings), 'description', 'avatar_url', and
+    'last_seen' (the time we last saw the character in our campaign), sorted
+    by name.
+
+    These come from our character index, which we refresh first (usually by
+    scraping just the first page of the campaign's /characters listing, which
+    includes tags and tagline for each character).  If that fails then we
+    return what we already have.
+    """
+    try:
+        refresh_characters()
     except Exception as e:
         cherrypy.log(f'Failed to fetch existing characters: {e}')
-        return []
+    return index.store().characters()
 
 
 def existing_names():
@@ -385,31 +729,46 @@ def existing_names():
 def characters_by_tag(tag):
     """
     Returns a list of character dicts that have the given tag.
-    Tag matching is case-insensitive.
+    Tag matching is case-insensitive.  This is an indexed query of our
+    character index, which we refresh first just as existing_characters()
+    does, so it usually costs one conditional GET of Obsidian Portal.
+    """
+    try:
+        refresh_characters()
+    except Exception as e:
+        cherrypy.log(f'Failed to refresh characters before finding the {tag!r} tag: {e}')
+    return index.store().by_tag(tag)
+
+
+_refresh_requested = Event()
+
+
+def request_refresh():
+    """
+    Wakes up update_used_names() to refresh our character index and used
+    names right away, rather than at the end of its current interval.
     """
-    tag_lower = tag.lower()
-    return [
-        char for char in existing_characters()
-        if any(t.lower() == tag_lower for t in char['tags'])
-    ]
+    _refresh_requested.set()
 
 
 def update_used_names():
     """
     We keep track of what names already exist in our campaign to avoid using the
     same name multiple times. Every time we create a character, we add its name
-    to our global name set, but here we also periodically download everything in
-    the background to update the list, in case we missed anything (e.g. if a new
-    character was added through the Obsidian Portal UI instead of here).
+    to our global name set, but here we also periodically refresh our character
+    index in the background (every [character_index] refresh_minutes, or when
+    request_refresh() is called) to update the list, in case we missed anything
+    (e.g. if a new character was added through the Obsidian Portal UI instead of
+    here).  When nothing has changed, each refresh is a single conditional GET.
     """
     while True:
+        _refresh_requested.clear()
         try:
-            for name in existing_names():
-                # we only track the personal name (e.g. "Gohei" instead of "Matsu Gohei")
-                c.USED_NAMES.add(name.split()[-1])
+            # we only track the personal name (e.g. "Gohei" instead of "Matsu Gohei")
+            c.USED_NAMES.update(name.split()[-1] for name in existing_names())
         except Exception as e:
             cherrypy.log(f'Failed to update used names: {e}')
-        sleep(3600)
+        _refresh_requested.wait(config['character_index']['refresh_minutes'] * 60)
 
 
 existing_name_updater = Thread(target=update_used_names, daemon=True)
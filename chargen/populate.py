@@ -0,0 +1,204 @@
+"""
+Pre-generate a large pool of NPCs offline and write them to disk as JSONL, one
+to_dict() per line, e.g.
+
+    python -m chargen.populate --type Samurai --base-rank 5 --count 250 --workers 8 --output samurai.jsonl
+    python -m chargen.populate --type Samurai --base-rank 5 --count 200000 --workers 8 --allow-duplicate-names
+    python -m chargen.populate --roster bureaucracy.ini --output bureaucracy.jsonl
+
+The work is split into chunks which are generated in parallel by a pool of
+worker processes using Character.batch(), and each chunk is written out as
+soon as it finishes, so we never hold the whole population in memory.
+
+Personal names must be unique across the whole pool, so rather than each
+worker picking names from its own private copy of c.USED_NAMES, a single
+coordinator process owns the set of used names and workers reserve names from
+it.  We only have several hundred names of each gender, and each character's
+gender is a coin flip (so in principle every character could be the same
+gender), so a pool larger than our unused names of either gender has to be
+generated with --allow-duplicate-names.  Chunks are
+written to a .part file next to --output which only replaces it once every
+chunk has been generated, so a run which fails midway leaves no partial pool.
+
+The chunks are generated from independent seeds derived from --seed, so the
+same seed and options regenerate the same characters, except that with unique
+names which worker reserves which names depends on scheduling.
+
+With --roster we instead generate every position of a roster spec (see the
+roster module for the format), whose names are always unique.
+"""
+import os
+import sys
+import json
+import inspect
+import argparse
+from multiprocessing import Pool
+from multiprocessing.managers import BaseManager
+
+import numpy as np
+
+from chargen import op, constants as c
+from chargen.character import Character
+from chargen.names import UsedNames
+from chargen.roster import load_spec, generate_roster
+from chargen.seeds import parse_seed, spawn_seeds
+
+
+class NameReservations:
+    """
+    This lives in the coordinator process and hands out names to the workers,
+    which talk to it through a ReservedNames proxy.  We take an int seed rather
+    than an rng since the worker's rng can't be shared across processes.
+    """
+    def __init__(self, used_names: list[str]):
+        self.used_names = UsedNames(c.NAMES)
+        self.used_names.update(used_names)
+
+    def reserve_many(self, gender: str, n: int, seed: int) -> list[str]:
+        return self.used_names.reserve_many(gender, n, np.random.default_rng(seed))
+
+    def free_count(self, gender: str) -> int:
+        return self.used_names.free_count(gender)
+
+
+class NameManager(BaseManager):
+    pass
+
+
+NameManager.register('NameReservations', NameReservations)
+
+
+class ReservedNames:
+    """
+    This is what the workers pass as the names argument of Character.batch(),
+    which reserves names from the coordinator rather than picking them from the
+    worker's own c.USED_NAMES.
+    """
+    def __init__(self, reservations):
+        self.reservations = reservations
+
+    def choose_many(self, gender: str, n: int, rng: np.random.Generator) -> list[str]:
+        return self.reservations.reserve_many(gender, n, int(rng.integers(2**63))) if n else []
+
+
+_names = None
+"""Each worker's ReservedNames, or None when duplicate names are allowed."""
+
+
+def _init_worker(reservations, used_names: list[str]):
+    global _names
+    if reservations is None:
+        c.USED_NAMES.update(used_names)
+    else:
+        _names = ReservedNames(reservations)
+
+
+def _generate_chunk(args: tuple) -> str:
+    """Generates one chunk of characters and returns them as JSONL."""
+    type_name, count, seed, params = args
+    characters = Character.types()[type_name].batch(count, seed=seed, names=_names, **params)
+    return ''.join(json.dumps(character.to_dict()) + '\n' for character in characters)
+
+
+def chunks(count: int, chunk_size: int, seed: int) -> list[tuple[int, int]]:
+    """Splits count characters into (size, seed) chunks with independent seeds."""
+    sizes = [chunk_size] * (count // chunk_size) + ([count % chunk_size] if count % chunk_size else [])
+    return list(zip(sizes, spawn_seeds(seed, len(sizes))))
+
+
+def write_roster(args, seed: int):
+    try:
+        roster = generate_roster(load_spec(args.roster), seed=seed)
+    except ValueError as e:
+        sys.exit(f'Generation failed: {e}')
+
+    out = sys.stdout if args.output == '-' else open(args.output, 'w')
+    try:
+        for char_dict in roster:
+            out.write(json.dumps(char_dict) + '\n')
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    print(f'Generated a roster of {len(roster)} characters with seed {seed}', file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--type', choices=sorted(Character.types()), default='Samurai')
+    parser.add_argument('--base-rank', type=int, help='required unless the type has a default rank, like Peasant')
+    parser.add_argument('--clan')
+    parser.add_argument('--family')
+    parser.add_argument('--house')
+    parser.add_argument('--lineage')
+    parser.add_argument('--school')
+    parser.add_argument('--count', type=int)
+    parser.add_argument('--roster', help='ini or JSON roster spec to generate instead of --count characters')
+    parser.add_argument('--workers', type=int, default=None, help='defaults to the number of CPUs')
+    parser.add_argument('--chunk-size', type=int, default=1000)
+    parser.add_argument('--seed', default='')
+    parser.add_argument('--output', default='-', help='JSONL file to write, or - for stdout')
+    parser.add_argument('--exclude-campaign-names', action='store_true',
+                        help="don't use any names already used by characters in Obsidian Portal")
+    parser.add_argument('--allow-duplicate-names', action='store_true',
+                        help='skip the name reservations, e.g. for pools bigger than our list of names')
+    args = parser.parse_args()
+    if not args.roster and not args.count:
+        parser.error('either --count or --roster is required')
+
+    params = {key: getattr(args, key) for key in ['clan', 'family', 'house', 'lineage', 'school'] if getattr(args, key)}
+    if args.base_rank is not None:
+        params['base_rank'] = args.base_rank
+    seed = parse_seed(args.seed)
+
+    if not args.roster:
+        character_type = Character.types()[args.type]
+        if 'base_rank' not in params and inspect.signature(character_type.__init__).parameters['base_rank'].default is inspect.Parameter.empty:
+            parser.error(f'--type {args.type} needs a --base-rank')
+        try:  # so that invalid options fail here rather than in every worker
+            character_type.batch(1, seed=seed, **params)
+        except (KeyError, ValueError) as e:
+            parser.error(f'cannot generate {args.type} characters with these options ({type(e).__name__}: {e})')
+
+    used_names = [name.split()[-1] for name in op.existing_names()] if args.exclude_campaign_names else []
+    if args.roster:
+        c.USED_NAMES.update(used_names)
+        write_roster(args, seed)
+        return
+
+    manager = reservations = None
+    if not args.allow_duplicate_names:
+        manager = NameManager()
+        manager.start()
+        reservations = manager.NameReservations(used_names)
+        free = {gender: reservations.free_count(gender) for gender in ['male', 'female']}
+        if args.count > min(free.values()):
+            manager.shutdown()
+            parser.error(f'{args.count} characters of random genders need {args.count} unused names of each gender, '
+                         f'but only {free["male"]} male and {free["female"]} female names are unused; '
+                         f'use --allow-duplicate-names to generate a pool this large')
+
+    tasks = [(args.type, size, chunk_seed, params) for size, chunk_seed in chunks(args.count, args.chunk_size, seed)]
+    part_path = f'{args.output}.part'
+    out = sys.stdout if args.output == '-' else open(part_path, 'w')
+    try:
+        with Pool(args.workers, initializer=_init_worker, initargs=(reservations, used_names)) as pool:
+            for lines in pool.imap_unordered(_generate_chunk, tasks):
+                out.write(lines)
+                out.flush()
+        if out is not sys.stdout:
+            out.close()
+            os.replace(part_path, args.output)
+    except ValueError as e:
+        sys.exit(f'Generation failed: {e}')
+    finally:
+        if out is not sys.stdout and not out.closed:  # we failed before every chunk was written
+            out.close()
+            os.remove(part_path)
+        if manager:
+            manager.shutdown()
+
+    print(f'Generated {args.count} {args.type} characters with seed {seed}', file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
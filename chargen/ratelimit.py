@@ -0,0 +1,49 @@
+"""
+Rate limiting and retry backoff for our requests to Obsidian Portal.
+
+Everything which talks to Obsidian Portal (bulk uploads, interactive uploads,
+and our background scraping) shares one op.Client per process, which takes a
+token from one of the TokenBuckets below before every request, so together
+they never make more requests than Obsidian Portal will put up with.  When a
+request fails in a way which is worth retrying, we wait for backoff() seconds
+first; this grows exponentially with each attempt and is jittered so that
+many threads failing at once don't all retry at once.
+"""
+import random
+from threading import Lock
+from time import monotonic, sleep
+
+
+class TokenBucket:
+    """
+    Allows rate requests per second on average, in bursts of up to burst
+    requests.  A thread which acquires a token when none are left reserves
+    the next one and sleeps until it's due, so waiting threads go in order.
+    """
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = monotonic()
+        self.lock = Lock()
+
+    def acquire(self) -> float:
+        """Takes a token, waiting until one is available, and returns how many seconds we waited."""
+        with self.lock:
+            now = monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0
+        if wait:
+            sleep(wait)
+        return wait
+
+
+def backoff(attempt: int, base: float, cap: float, rng=random) -> float:
+    """
+    Returns how many seconds to wait before retrying after the given failed
+    attempt (starting from 0), chosen at random from 0 up to base * 2**attempt
+    (but never more than cap), i.e. exponential backoff with "full jitter".
+    """
+    return rng.uniform(0, min(cap, base * 2 ** attempt))
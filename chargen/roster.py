@@ -0,0 +1,164 @@
+"""
+Generating whole rosters of characters, e.g. a bureaucracy of six ministries
+in each of eight provinces with a minister and deputy minister for each, plus
+a governor for each province, from a declarative spec like this:
+
+    # top-level values are shared by every group
+    clan = lion
+
+    [ministers]
+    rank = 6, 7
+    ministry = Rites, Retainers, Revenue, War, Works, Justice
+    province = Ikoma, Kitsu, Matsu, Akodo, Damasu, Kenson, Sanpuku, Yojin
+    summary = {rank_title} of {ministry} for {province}
+    tags = Ministry of {ministry}, {province}
+
+    [governors]
+    rank = 8
+    province = Ikoma, Kitsu, Matsu, Akodo, Damasu, Kenson, Sanpuku, Yojin
+    summary = Governor of {province}
+    tags = {province}
+
+Each section is a group of positions, and every list in a group is expanded
+into one position for each combination of its values, so [ministers] above
+has 2 x 6 x 8 = 96 positions.  The rank, clan, family, house, lineage, and
+school values are passed to the character type (which is a Samurai unless the
+group gives a type), and every value including rank_title (the display name of
+the rank from our config) can be used in the summary and tags, which are
+Python format strings.  A group may also give a count of characters to
+generate for each position.  Specs are ini files like the one above or the
+equivalent JSON, where the groups are objects.
+
+Positions with the same character parameters are generated together with one
+vectorized Character.batch() call, and these batches are generated one after
+another in a fixed order.  Personal names are unique across the whole roster
+(and unused in our campaign, or leased if we're given a NameLeases), and since
+each batch picks its names in turn, the same seed with the same used names
+reproduces the whole roster, names included.
+
+Rosters can also be generated from the command line with the populate module.
+"""
+import json
+import inspect
+from math import prod
+from itertools import product
+
+from configobj import ConfigObj
+
+from chargen import config, constants as c
+from chargen.character import Character
+from chargen.names import UsedNames
+from chargen.seeds import parse_seed, spawn_seeds
+
+PARAMS = ('rank', 'clan', 'family', 'house', 'lineage', 'school')
+"""Group values which are passed to the character type, where rank is passed as base_rank."""
+
+
+def load_spec(path: str) -> dict:
+    """Loads a roster spec from an ini or (if the filename ends in .json) JSON file."""
+    if path.endswith('.json'):
+        with open(path) as f:
+            return json.load(f)
+    return ConfigObj(path, file_error=True).dict()
+
+
+def _as_list(value) -> list:
+    return value if isinstance(value, list) else [value]
+
+
+def expand(spec: dict, max_size: int = None) -> list[dict]:
+    """
+    Returns every position in the spec, in order, as a dict with the group
+    name, the character type, the parameters to generate the character with,
+    the values of the position (which are also exposed in to_dict()), and its
+    formatted summary and tags.  This raises a ValueError for an invalid spec,
+    or (before expanding it) for one with more than max_size positions.
+    """
+    defaults = {key: value for key, value in spec.items() if not isinstance(value, dict)}
+    groups = {key: value for key, value in spec.items() if isinstance(value, dict)} or {'roster': {}}
+
+    positions = []
+    for group, section in groups.items():
+        settings = dict(defaults, **section)
+        type_name = settings.pop('type', 'Samurai')
+        if type_name not in Character.types():
+            raise ValueError(f'The {group} group has an unknown type {type_name!r}')
+        count = int(settings.pop('count', 1))
+        summary = settings.pop('summary', '')
+        if isinstance(summary, list):  # ConfigObj splits unquoted values with commas into lists
+            summary = ', '.join(summary)
+        tags = _as_list(settings.pop('tags', []))
+        required = inspect.signature(Character.types()[type_name].__init__).parameters['base_rank'].default is inspect.Parameter.empty
+        if required and 'rank' not in settings:
+            raise ValueError(f'The {group} group needs a rank')
+
+        axes = {key: _as_list(value) for key, value in settings.items()}
+        size = len(positions) + count * prod(len(values) for values in axes.values())
+        if max_size is not None and size > max_size:
+            raise ValueError(f'This roster has more than {max_size} positions, which is the most we can generate at once')
+        for combination in product(*axes.values()):
+            values = dict(zip(axes, combination))
+            params = {key: values[key] for key in PARAMS if values.get(key) not in (None, '')}
+            if 'rank' in params:
+                params['base_rank'] = int(params.pop('rank'))
+            values['rank_title'] = config['ranks'].get(type_name, {}).get(str(params.get('base_rank')), '')
+            try:
+                formatted = (summary.format(**values), [tag.format(**values) for tag in tags])
+            except KeyError as e:
+                raise ValueError(f'The {group} group has no value for {e} in its summary or tags')
+            for _ in range(count):
+                positions.append({
+                    'group': group,
+                    'type': type_name,
+                    'params': params,
+                    'values': values,
+                    'summary': formatted[0],
+                    'tags': formatted[1],
+                })
+    return positions
+
+
+class RosterNames:
+    """
+    This is what we pass as the names argument of Character.batch() when
+    generating a roster, which reserves names from a copy of c.USED_NAMES so
+    that no two characters in the roster get the same personal name.
+    """
+    def __init__(self):
+        self.used_names = UsedNames(c.NAMES)
+        self.used_names.update(c.USED_NAMES)
+
+    def choose_many(self, gender: str, n: int, rng) -> list[str]:
+        return self.used_names.reserve_many(gender, n, rng)
+
+
+def generate_roster(spec: dict, seed=None, names=None, max_size: int = None) -> list[dict]:
+    """
+    Generates a character for every position in the spec and returns their
+    to_dict() values in the same order as expand(), with the summary and tags
+    of their position and the values of their position as 'position'.  The
+    names argument is passed to Character.batch(), and must pick different
+    names for each character (like RosterNames, the default, or NameLeases).
+    This raises a ValueError if the spec has more than max_size positions.
+    """
+    positions = expand(spec, max_size)
+    batches = {}
+    for i, position in enumerate(positions):
+        key = (position['type'], tuple(sorted(position['params'].items())))
+        batches.setdefault(key, []).append(i)
+
+    names = names or RosterNames()
+    roster = [None] * len(positions)
+    for (type_name, params), batch_seed in zip(batches, spawn_seeds(parse_seed(seed), len(batches))):
+        indices = batches[type_name, params]
+        characters = Character.types()[type_name].batch(len(indices), seed=batch_seed, names=names, **dict(params))
+        for i, character in zip(indices, characters):
+            position = positions[i]
+            char_dict = character.to_dict()
+            char_dict['tags'].extend(tag for tag in position['tags'] if tag not in char_dict['tags'])
+            if position['summary']:
+                char_dict['summary'] = position['summary']
+            char_dict['position'] = dict(position['values'], group=position['group'])
+            roster[i] = char_dict
+    return roster
+
@@ -0,0 +1,45 @@
+"""
+Seeds for reproducible character generation.
+
+Every character records the seed it was generated from, so given the same
+seed, parameters, and version of this code we can regenerate exactly the same
+character (except for its personal name if that name has since been used by
+another character in the campaign).  All of our randomness goes through
+explicit random.Random (for single characters) or numpy Generator (for
+batches) objects created from these seeds rather than the global random
+module, so generation is also safe to spread across threads and processes.
+"""
+import secrets
+
+import numpy as np
+
+SEED_BITS = 53
+"""
+Our seeds end up in JSON, and JavaScript numbers only represent integers
+exactly up to 2**53, so a bigger seed echoed back to us by the browser would
+no longer be the same seed.
+"""
+
+
+def new_seed() -> int:
+    """Returns a fresh random seed for when the caller didn't specify one."""
+    return secrets.randbits(SEED_BITS)
+
+
+def parse_seed(seed) -> int:
+    """
+    Our endpoints get their parameters as strings, and an empty seed means the
+    same thing as no seed at all, so this returns an int seed either way.
+    """
+    return new_seed() if seed in (None, '') else int(seed)
+
+
+def spawn_seeds(seed: int, n: int) -> list[int]:
+    """
+    Derives n independent child seeds from a parent seed, e.g. one for each
+    worker or each minister in a roster.  These are statistically independent
+    streams (via numpy's SeedSequence) and are always the same for the same
+    parent seed, so parallel generation remains deterministic regardless of
+    which worker finishes first.
+    """
+    return [int(child.generate_state(1, np.uint64)[0]) for child in np.random.SeedSequence(seed).spawn(n)]
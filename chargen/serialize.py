@@ -0,0 +1,60 @@
+"""
+Serialization and compression of the JSON responses from our ajax endpoints.
+
+Some of our responses are large (a ministry or roster of characters with all
+of their rendered text, or hundreds of characters from generate_batch), so we
+serialize with orjson when it's installed, which is several times faster than
+the json module, and fall back to the json module when it's not.  Either way
+the browser gets equivalent JSON.  Large responses are also compressed when
+the browser accepts it; see website.ajax().
+"""
+import json
+import gzip
+import zlib
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def json_dumps(obj) -> bytes:
+    return json.dumps(obj).encode('UTF-8')
+
+
+def orjson_dumps(obj) -> bytes:
+    # the json module converts non-string keys like ints to strings, so we do the same
+    return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+
+
+SERIALIZERS = {'json': json_dumps}
+"""Our available serializers by name, each of which converts an object to JSON bytes."""
+if orjson:
+    SERIALIZERS['orjson'] = orjson_dumps
+
+
+def get_serializer(name: str = 'auto'):
+    """
+    Returns the named serializer, where 'auto' means the fastest one we have.
+    Raises a ValueError if the requested serializer isn't installed.
+    """
+    if name == 'auto':
+        return SERIALIZERS.get('orjson', json_dumps)
+    elif name not in SERIALIZERS:
+        raise ValueError(f'The {name} serializer is not available; is {name} installed?')
+    return SERIALIZERS[name]
+
+
+COMPRESSORS = {
+    'gzip': lambda body, level: gzip.compress(body, level, mtime=0),
+    'deflate': lambda body, level: zlib.compress(body, level),
+}
+"""
+The Content-Encodings we support, in order of preference, each of which
+takes the body bytes and a compression level from 1 to 9.  Note that the
+deflate Content-Encoding is actually the zlib format, not raw deflate.
+"""
+
+
+def compress(body: bytes, encoding: str, level: int) -> bytes:
+    return COMPRESSORS[encoding](body, level)
@@ -0,0 +1,220 @@
+"""
+Uploading generated characters (and their portraits) to Obsidian Portal.
+
+Each character goes through several stages: loading and cropping its
+portrait, uploading the cropped headshot as its avatar and the full portrait
+as a file for its bio (which can happen at the same time), and finally
+creating the character itself.  Uploading a roster one character and one
+request at a time takes the sum of all of those round trips, so the
+UploadPipeline runs every character through these stages concurrently, with
+a separately bounded pool of threads for each stage so that we never have more
+than a few requests of each kind in flight at once.
+
+Each stage can also report its progress as it finishes, which lets us stream
+progress to the frontend while a roster uploads (see upload_stream()).
+"""
+import re
+import base64
+import traceback
+from queue import Queue
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor
+
+import cherrypy
+
+from chargen import config, op, art, images
+
+
+def image_filename(name: str) -> str:
+    """Create a safe filename from the character name."""
+    return re.sub(r'[^a-zA-Z0-9]', '', name.replace(' ', '')) + '.png'
+
+
+def load_image(char_data: dict) -> bytes:
+    """
+    Returns the portrait for an uploaded character, which is either the
+    image_id of a portrait in our image store or (from older pages) the
+    base64 image_data itself, or None if the character has no portrait.
+    """
+    if char_data.get('image_id'):
+        try:
+            return images.store.get(char_data['image_id'])
+        except KeyError:
+            raise ValueError('This portrait is no longer available; please generate new art')
+    elif char_data.get('image_data'):
+        return base64.b64decode(char_data['image_data'])
+    return None
+
+
+def prepare_images(char_data: dict) -> tuple[bytes, bytes]:
+    """
+    Loads a character's portrait and returns (full image, headshot) bytes,
+    where the headshot is cropped to its headshot_crop if we have one.
+    """
+    image_bytes = load_image(char_data)
+    headshot_crop = char_data.get('headshot_crop')
+    if headshot_crop:
+        headshot_bytes = art.crop_headshot(
+            image_bytes,
+            int(headshot_crop['x']),
+            int(headshot_crop['y']),
+            int(headshot_crop['width']),
+            int(headshot_crop['height'])
+        )
+    else:
+        headshot_bytes = image_bytes
+    return image_bytes, headshot_bytes
+
+
+class UploadPipeline:
+    def __init__(self, character_workers: int, crop_workers: int, upload_workers: int, create_workers: int):
+        self.characters = ThreadPoolExecutor(character_workers, thread_name_prefix='upload')
+        self.crop = ThreadPoolExecutor(crop_workers, thread_name_prefix='upload-crop')
+        self.upload = ThreadPoolExecutor(upload_workers, thread_name_prefix='upload-image')
+        self.create = ThreadPoolExecutor(create_workers, thread_name_prefix='upload-create')
+
+    def upload_all(self, characters: list[dict]) -> list[dict]:
+        """
+        Uploads every character concurrently and returns a result dict for
+        each one, in the same order as the characters.  A failure for one
+        character never affects the others.
+        """
+        return list(self.characters.map(self.upload_character, characters))
+
+    def upload_stream(self, characters: list[dict]):
+        """
+        Like upload_all(), except that this is a generator which yields an
+        event dict as each stage of each character finishes, e.g.
+
+            {'index': 2, 'name': 'Matsu Gohei', 'stage': 'avatar', 'success': True, 'error': None}
+
+        where index is the position of the character in the list and stage is
+        one of 'crop', 'avatar', 'file', or 'create'.  When a character is
+        completely finished we yield its upload_all() result with 'index' and
+        a stage of 'done', so every character ends with exactly one such event.
+        """
+        if not characters:
+            return
+        events = Queue()
+        for index, char_data in enumerate(characters):
+            self.characters.submit(self.upload_character, char_data, partial(_report, events, index))
+        remaining = len(characters)
+        while remaining:
+            event = events.get()
+            remaining -= event['stage'] == 'done'
+            yield event
+
+    def _upload_images(self, name: str, char_data: dict, progress) -> tuple[str, str]:
+        """
+        Runs the image stages for one character, returning its avatar upload id
+        and bio image embed.  As before, if any of this fails we log it and
+        continue without that image rather than failing the whole character.
+        """
+        filename = image_filename(name)
+        try:
+            image_bytes, headshot_bytes = self.crop.submit(prepare_images, char_data).result()
+            progress('crop')
+        except Exception as e:
+            cherrypy.log(f'Failed to prepare image for {name}: {e}')
+            progress('crop', e)
+            return '', ''
+
+        # Upload headshot as avatar (for character thumbnail) while we upload
+        # the full image as a file (for bio embed)
+        avatar = self.upload.submit(op.upload_avatar, headshot_bytes, filename)
+        file = self.upload.submit(op.upload_image, image_bytes, filename)
+
+        avatar_upload_id = image_embed = ''
+        try:
+            avatar_upload_id = str(avatar.result().get('id', ''))
+            progress('avatar')
+        except Exception as e:
+            cherrypy.log(f'Failed to upload avatar for {name}: {e}')
+            progress('avatar', e)
+        try:
+            file_id = file.result().get('id')
+            if file_id:
+                image_embed = f'[[File:{file_id} | class=media-item-align-none | {filename}]]'
+            progress('file')
+        except Exception as e:
+            cherrypy.log(f'Failed to upload image for {name}: {e}')
+            progress('file', e)
+        return avatar_upload_id, image_embed
+
+    def upload_character(self, char_data: dict, progress=None) -> dict:
+        """
+        Uploads a single character, returning its result dict; this never
+        raises.  If given, progress(name, stage, error=None) is called as each
+        stage finishes and progress(name, 'done', result=result) at the end.
+        """
+        result = {'success': False, 'name': 'Unknown', 'error': 'The upload was interrupted'}
+        try:
+            result = self._upload_character(char_data, progress or _ignore)
+        finally:  # so that upload_stream() always gets a 'done' event for every character
+            if progress:
+                progress(result['name'], 'done', result=result)
+        return result
+
+    def _upload_character(self, char_data: dict, progress) -> dict:
+        name = None
+        try:
+            if not isinstance(char_data, dict):
+                raise ValueError(f'Expected a character object, not {type(char_data).__name__}')
+            name = char_data.get('name', '')
+            progress = partial(progress, name)
+            tags = char_data.get('tags', [])
+            if isinstance(tags, str):
+                tags = list(filter(bool, map(str.strip, tags.split(','))))
+
+            avatar_upload_id = image_embed = ''
+            if char_data.get('image_id') or char_data.get('image_data'):
+                avatar_upload_id, image_embed = self._upload_images(name, char_data, progress)
+
+            create = self.create.submit(
+                op.create_character,
+                name,
+                summary=char_data.get('summary', ''),
+                tags=tags,
+                description=char_data.get('public', ''),
+                bio=image_embed,
+                gm_info=char_data.get('private', ''),
+                avatar_upload_id=avatar_upload_id
+            )
+            try:
+                create.result()
+                progress('create')
+            except Exception as e:
+                progress('create', e)
+                raise
+
+            slug = name.lower().replace(' ', '-')
+            return {
+                'success': True,
+                'name': name,
+                'view_url': config['campaign_url'] + '/characters/' + slug,
+                'edit_url': config['campaign_url'] + '/characters/' + slug + '/edit',
+                'error': None
+            }
+        except Exception as e:
+            cherrypy.log(f'Failed to upload {name or "unknown"}: {e}\n{traceback.format_exc()}')
+            return {
+                'success': False,
+                'name': name or 'Unknown',
+                'error': str(e)
+            }
+
+    def shutdown(self):
+        for pool in [self.characters, self.crop, self.upload, self.create]:
+            pool.shutdown(wait=False)
+
+
+def _ignore(*args, **kwargs):
+    pass
+
+
+def _report(events: Queue, index: int, name: str, stage: str, error: Exception = None, result: dict = None):
+    """Turns a progress() call for the character at index into an upload_stream() event."""
+    if result is not None:
+        events.put(dict(result, index=index, stage=stage))
+    else:
+        events.put({'index': index, 'name': name, 'stage': stage, 'success': error is None, 'error': error and str(error)})
@@ -1,49 +1,236 @@
 import os
 import json
-import base64
-import re
+import gzip
+import hashlib
 import traceback
 from functools import wraps
+from random import Random
 
 import jinja2
 import cherrypy
+from cherrypy.lib import cptools, httputil
 
-from chargen import config, op, art, constants as c
+from chargen import config, op, art, jobs, uploads, images, metrics, serialize, constants as c, CONFIG_FILES
+from chargen.names import NameLeases
 from chargen.character import Character
-from chargen import ministry
+from chargen.seeds import SEED_BITS, parse_seed
+from chargen import ministry, roster
 
 jinja_loader = jinja2.FileSystemLoader(os.path.join(c.HERE, 'templates'))
-jinja_env = jinja2.Environment(loader=jinja_loader)
+jinja_env = jinja2.Environment(loader=jinja_loader, bytecode_cache=jinja2.FileSystemBytecodeCache())
+
+CONFIG_MTIME = max(os.stat(fpath).st_mtime for fpath in CONFIG_FILES if os.path.exists(fpath))
+"""
+Our config is only parsed at startup (and we restart whenever it changes), so
+this is effectively the version of the config which this process is using.
+"""
+
+_pages = {}
+"""Rendered pages keyed by template name; see cached_page()."""
+
+
+def cached_page(template_name: str, context) -> bytes:
+    """
+    Our pages only depend on our config and our templates, so rather than
+    rendering them on every request, we render each page once per version of
+    its template (given the context returned by calling context()) and serve
+    it from memory.  We also send ETag and Last-Modified headers so browsers
+    can revalidate with a 304, and keep a gzipped copy for browsers which
+    accept it.
+    """
+    template = jinja_env.get_template(template_name)
+    mtime = max(os.stat(template.filename).st_mtime, CONFIG_MTIME)
+    page = _pages.get(template_name)
+    if not page or page['mtime'] != mtime:
+        body = template.render(context()).encode('UTF-8')
+        page = _pages[template_name] = {
+            'mtime': mtime,
+            'body': body,
+            'gzipped': gzip.compress(body),
+            'etag': '"{}"'.format(hashlib.sha1(body).hexdigest()),
+            'last_modified': httputil.HTTPDate(mtime),
+        }
+
+    headers = cherrypy.response.headers
+    headers['ETag'] = page['etag']
+    headers['Last-Modified'] = page['last_modified']
+    headers['Vary'] = 'Accept-Encoding'
+    cptools.validate_etags()
+    cptools.validate_since()
+
+    if accepted_encoding(['gzip']):
+        headers['Content-Encoding'] = 'gzip'
+        return page['gzipped']
+    return page['body']
+
+
+def accepted_encoding(encodings: list[str]) -> str:
+    """
+    Returns whichever of the given Content-Encodings the browser most prefers
+    according to its Accept-Encoding header (or our first choice if it accepts
+    any of them equally), or None if it accepts none of them.
+    """
+    accepted = cherrypy.request.headers.elements('Accept-Encoding')
+    refused = {encoding.value for encoding in accepted if encoding.qvalue == 0}
+    for encoding in accepted:  # these are sorted from most to least preferred
+        if encoding.qvalue > 0:
+            if encoding.value in encodings:
+                return encoding.value
+            elif encoding.value == '*':
+                return next((e for e in encodings if e not in refused), None)
+    return None
+
+
+dumps = serialize.get_serializer(config['ajax']['serializer'])
 
 
 def ajax(func):
     """
     Decorator which takes a function and converts it to one which converts its
-    return value to JSON and sets the Content-Type response header.
+    return value to JSON and sets the Content-Type response header.  Responses
+    of at least compress_min_bytes are compressed if the browser accepts it.
     """
     @cherrypy.expose
     @wraps(func)
     def wrapped(*args, **kwargs):
-        cherrypy.response.headers['Content-Type'] = 'application/json'
-        return json.dumps(func(*args, **kwargs)).encode('UTF-8')
+        headers = cherrypy.response.headers
+        headers['Content-Type'] = 'application/json'
+        body = dumps(func(*args, **kwargs))
+        if len(body) >= config['ajax']['compress_min_bytes']:
+            headers['Vary'] = 'Accept-Encoding'
+            encoding = accepted_encoding(list(serialize.COMPRESSORS))
+            if encoding:
+                headers['Content-Encoding'] = encoding
+                body = serialize.compress(body, encoding, config['ajax']['compress_level'])
+        return body
     return wrapped
 
 
+def generate_art(prompt: str) -> dict:
+    """
+    Generate an image from the given prompt and save it to our image store.
+    Returns the image id and URL plus suggested headshot crop coordinates.
+    """
+    try:
+        image_bytes = art.generate_image(prompt)
+        image_id = images.store.put(image_bytes)
+        # Get suggested headshot crop from the generated image
+        crop_x, crop_y, crop_w, crop_h = art.get_headshot_crop(image_bytes)
+        return {
+            'image_id': image_id,
+            'image_url': f'images/{image_id}.png',
+            'headshot_crop': {
+                'x': crop_x,
+                'y': crop_y,
+                'width': crop_w,
+                'height': crop_h
+            },
+            'error': None
+        }
+    except Exception as e:
+        return {'image_id': None, 'image_url': None, 'headshot_crop': None, 'error': str(e)}
+
+
+art_queue = jobs.JobQueue(generate_art, **config['art_jobs'])
+cherrypy.engine.subscribe('stop', art_queue.shutdown)
+
+upload_pipeline = uploads.UploadPipeline(**config['uploads'])
+cherrypy.engine.subscribe('stop', upload_pipeline.shutdown)
+
+
+def name_leases(limit: int = None) -> NameLeases:
+    """
+    Returns the NameLeases for the characters of one request, which lease
+    their personal names until they're uploaded, so GMs generating characters
+    at the same time don't get the same names; see [names] in configspec.ini.
+    Bulk generation passes a limit of 0, so that its characters never lease
+    names but still never share a name with each other.
+    """
+    if limit is None:
+        limit = config['names']['max_leases_per_request']
+    return NameLeases(c.USED_NAMES, config['names']['lease_minutes'] * 60, limit)
+
+
+MAX_BATCH_SIZE = 200
+"""The most characters we'll generate in one generate_batch or generate_stream request."""
+
+
+def batch_size(count: str) -> int:
+    """Parses the count of a bulk generation request, raising a 400 if it's not a valid size."""
+    try:
+        count = int(count)
+    except ValueError:
+        raise cherrypy.HTTPError(400, f'Invalid count {count!r}')
+    if not 1 <= count <= MAX_BATCH_SIZE:
+        raise cherrypy.HTTPError(400, f'We can only generate 1 to {MAX_BATCH_SIZE} characters at a time')
+    return count
+
+
+MAX_ROSTER_SIZE = 500
+"""The most positions we'll generate in one roster_generate request."""
+
+MAX_JOB_WAIT = 2
+"""
+The longest we'll hold a request open when polling for a job, in seconds;
+every request we hold open ties up one of our CherryPy threads, so the
+frontend polls with short waits and backs off between polls instead.
+"""
+
+
 class Root:
     @cherrypy.expose
     def index(self):
-        return jinja_env.get_template('index.html').render({
+        return cached_page('index.html', lambda: {
             'config': config.dict(),
             'types': list(Character.types().keys())
-        }).encode('UTF-8')
+        })
 
     @ajax
     def generate(self, type: str, **params):
         """
         This is invoked when the frontend wants to make a character; we return a
-        randomly generated character of the given type (e.g. "samurai").
+        randomly generated character of the given type (e.g. "samurai").  If a
+        seed is given then the same seed and params return the same character.
+        """
+        return Character.types()[type](names=name_leases(), **params).to_dict()
+
+    @ajax
+    def generate_batch(self, type: str, count: str, seed: str = '', **params):
+        """
+        This is like generate() but returns many characters of the given type at
+        once, using the vectorized Character.batch() generator.  We return the
+        seed of the batch so that it can be regenerated later.
         """
-        return Character.types()[type](**params).to_dict()
+        count = batch_size(count)
+        seed = parse_seed(seed)
+        try:
+            characters = Character.types()[type].batch(count, seed=seed, names=name_leases(0), **params)
+        except ValueError as e:  # e.g. we don't have count unused names
+            raise cherrypy.HTTPError(400, str(e))
+        return {'seed': seed, 'characters': [character.to_dict() for character in characters]}
+
+    @cherrypy.expose
+    @cherrypy.config(**{'response.stream': True})
+    def generate_stream(self, type: str, count: str, seed: str = '', **params):
+        """
+        This is like generate() but streams count characters of the given type
+        as newline-delimited JSON, one to_dict() per line, writing each one out
+        as soon as it's generated.  Each character gets its own seed derived
+        from the seed of the stream, which we return in the X-Seed header.
+        """
+        character_type = Character.types()[type]
+        count = batch_size(count)
+        seed = parse_seed(seed)
+        names = name_leases(0)
+        cherrypy.response.headers['Content-Type'] = 'application/x-ndjson'
+        cherrypy.response.headers['X-Seed'] = str(seed)
+
+        def stream():
+            seeds = Random(seed)
+            for _ in range(count):
+                character = character_type(seed=seeds.getrandbits(SEED_BITS), names=names, **params)
+                yield dumps(character.to_dict()) + b'\n'
+        return stream()
 
     @ajax
     def upload(self, **kwargs):
@@ -59,7 +246,6 @@ class Root:
         public = data.get('public', '')
         private = data.get('private', '')
         tags = data.get('tags', '')
-        image_data = data.get('image_data', '')
         image_embed = ''  # will be set if we upload the image
 
         slug = name.lower().replace(' ', '-')
@@ -69,27 +255,11 @@ class Root:
 
         # If we have image data, upload it for both avatar and bio
         avatar_upload_id = ''
-        headshot_crop = data.get('headshot_crop', None)
-        if image_data:
+        if data.get('image_id') or data.get('image_data'):
             try:
-                # Decode base64 image data
-                image_bytes = base64.b64decode(image_data)
-
-                # Create a safe filename from the character name
-                safe_name = re.sub(r'[^a-zA-Z0-9]', '', name.replace(' ', ''))
-                filename = f'{safe_name}.png'
-
-                # Create headshot crop for avatar if crop coordinates provided
-                if headshot_crop:
-                    headshot_bytes = art.crop_headshot(
-                        image_bytes,
-                        int(headshot_crop['x']),
-                        int(headshot_crop['y']),
-                        int(headshot_crop['width']),
-                        int(headshot_crop['height'])
-                    )
-                else:
-                    headshot_bytes = image_bytes
+                # Load the image and create a headshot crop for the avatar
+                image_bytes, headshot_bytes = uploads.prepare_images(data)
+                filename = uploads.image_filename(name)
 
                 # Upload headshot as avatar (for character thumbnail)
                 avatar_info = op.upload_avatar(headshot_bytes, filename)
@@ -113,67 +283,141 @@ class Root:
         }
 
     @ajax
-    def art_prompt(self, **character_data):
+    def art_prompt(self, seed: str = '', **character_data):
         """
         Generate a suggested art prompt based on character data.
-        The frontend sends the character dict and we return a prompt string.
+        The frontend sends the character dict and we return a prompt string;
+        the same seed and character data always produce the same prompt.
         """
         # Convert string representations back to appropriate types
         if 'traits' in character_data and isinstance(character_data['traits'], str):
             character_data['traits'] = [t.strip() for t in character_data['traits'].split(',') if t.strip()]
         if 'xp' in character_data:
             character_data['xp'] = int(character_data['xp'])
-        return {'prompt': art.generate_prompt(character_data)}
+        return {'prompt': art.generate_prompt(character_data, rng=Random(parse_seed(seed)))}
 
     @ajax
     def generate_art(self, prompt: str):
         """
-        Generate an image from the given prompt.
-        Returns base64-encoded image data plus suggested headshot crop coordinates.
+        Generate an image from the given prompt, blocking until it's done.
+        The frontend uses art_jobs instead, which doesn't tie up this thread.
+        """
+        return generate_art(prompt)
+
+    @ajax
+    def art_jobs(self, job_id=None, prompt='', wait='0'):
+        """
+        Calling /art_jobs?prompt=... submits a job to generate art from that
+        prompt and returns its id, and then /art_jobs/<id> returns the status
+        of the job, including its result once it's done (in the same format as
+        generate_art).  Pass wait=N to wait up to N seconds (at most
+        MAX_JOB_WAIT) for the job to finish.  If too many jobs are already
+        queued we return a 503.
+        """
+        if job_id is None:
+            if not prompt:
+                cherrypy.response.status = 400
+                return {'id': None, 'status': 'rejected', 'result': None, 'error': 'No prompt given.'}
+            try:
+                job = art_queue.submit(prompt)
+            except jobs.QueueFull as e:
+                cherrypy.response.status = 503
+                cherrypy.response.headers['Retry-After'] = '5'
+                return {'id': None, 'status': 'rejected', 'result': None, 'error': str(e)}
+        else:
+            try:
+                wait = float(wait)
+            except ValueError:
+                wait = -1
+            if not 0 <= wait:  # which also rejects nan
+                cherrypy.response.status = 400
+                return {'id': job_id, 'status': 'rejected', 'result': None, 'error': 'Invalid wait.'}
+            job = art_queue.get(job_id, wait=min(wait, MAX_JOB_WAIT))
+            if not job:
+                cherrypy.response.status = 404
+                return {'id': job_id, 'status': 'missing', 'result': None, 'error': 'No such art job.'}
+        return job.to_dict()
+
+    @cherrypy.expose
+    def images(self, filename: str):
+        """
+        Serves a PNG from our image store by its id, e.g. /images/<id>.png,
+        which never changes since the id is the hash of the image itself.
         """
+        image_id, ext = os.path.splitext(filename)
+        if ext != '.png' or image_id not in images.store:
+            raise cherrypy.HTTPError(404, 'No such image')
+
+        headers = cherrypy.response.headers
+        headers['Content-Type'] = 'image/png'
+        headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+        headers['ETag'] = f'"{image_id}"'
+        cptools.validate_etags()
         try:
-            image_data = art.generate_image_base64(prompt)
-            # Get suggested headshot crop from the generated image
-            image_bytes = base64.b64decode(image_data)
-            crop_x, crop_y, crop_w, crop_h = art.get_headshot_crop(image_bytes)
-            return {
-                'image': image_data,
-                'headshot_crop': {
-                    'x': crop_x,
-                    'y': crop_y,
-                    'width': crop_w,
-                    'height': crop_h
-                },
-                'error': None
-            }
-        except Exception as e:
-            return {'image': None, 'headshot_crop': None, 'error': str(e)}
+            return images.store.get(image_id)
+        except KeyError:
+            raise cherrypy.HTTPError(404, 'No such image')
+
+    @cherrypy.expose
+    def metrics(self):
+        """Our latency histograms and error counters in the Prometheus text format."""
+        cherrypy.response.headers['Content-Type'] = 'text/plain; version=0.0.4; charset=utf-8'
+        return metrics.render().encode('UTF-8')
+
+    @ajax
+    def refresh_characters(self):
+        """
+        Wakes up our background updater to refresh our index of the characters
+        in our campaign (and so our used names) now rather than waiting for its
+        next refresh, e.g. after adding characters through the Obsidian Portal
+        UI.  This returns right away, before the refresh is done.
+        """
+        op.request_refresh()
+        return {'requested': True}
 
     @cherrypy.expose
     def ministry(self):
         """Bulk ministry generator page."""
-        return jinja_env.get_template('ministry.html').render({
+        return cached_page('ministry.html', lambda: {
             'config': config.dict(),
-        }).encode('UTF-8')
+        })
 
     @ajax
-    def ministry_generate(self, base_rank: str, clan='', family='', house=''):
+    def ministry_generate(self, base_rank: str, clan='', family='', house='', seed=''):
         """
         Generate 6 ministers for bulk ministry creation.
-        Returns a list of 6 character dicts.
+        Returns a list of 6 character dicts, plus the seed of the roster.
         """
+        seed = parse_seed(seed)
         roster = ministry.generate_ministry_roster(
             rank=int(base_rank),
             clan=clan or None,
             family=family or None,
-            house=house or None
+            house=house or None,
+            seed=seed,
+            names=name_leases()
         )
-        return {'characters': roster}
+        return {'seed': seed, 'characters': roster}
+
+    @ajax
+    def roster_generate(self, **kwargs):
+        """
+        Generate every position of a roster spec (see the roster module), e.g.
+        a JSON POST of {"spec": {"ministers": {...}, "governors": {...}}, "seed": ""}.
+        Returns a list of character dicts, plus the seed of the roster.
+        """
+        data = json.loads(cherrypy.request.body.read())
+        seed = parse_seed(data.get('seed'))
+        try:
+            characters = roster.generate_roster(data.get('spec', {}), seed=seed, names=name_leases(), max_size=MAX_ROSTER_SIZE)
+        except ValueError as e:
+            raise cherrypy.HTTPError(400, str(e))
+        return {'seed': seed, 'characters': characters}
 
     @ajax
     def ministry_upload_bulk(self, **kwargs):
         """
-        Upload multiple characters in sequence.
+        Upload multiple characters concurrently (see the uploads module).
         Expects JSON POST with 'characters' array.
         Returns status for each character.
         """
@@ -183,81 +427,31 @@ class Root:
         else:
             data = kwargs
 
-        characters = data.get('characters', [])
-        results = []
+        return {'results': upload_pipeline.upload_all(data.get('characters', []))}
 
-        for char_data in characters:
-            try:
-                name = char_data.get('name', '')
-                summary = char_data.get('summary', '')
-                public = char_data.get('public', '')
-                private = char_data.get('private', '')
-                tags = char_data.get('tags', [])
-                if isinstance(tags, str):
-                    tags = list(filter(bool, map(str.strip, tags.split(','))))
-                image_data = char_data.get('image_data', '')
-
-                image_embed = ''
-                avatar_upload_id = ''
-                headshot_crop = char_data.get('headshot_crop', None)
-                if image_data:
-                    try:
-                        image_bytes = base64.b64decode(image_data)
-                        safe_name = re.sub(r'[^a-zA-Z0-9]', '', name.replace(' ', ''))
-                        filename = f'{safe_name}.png'
-
-                        # Create headshot crop for avatar if crop coordinates provided
-                        if headshot_crop:
-                            headshot_bytes = art.crop_headshot(
-                                image_bytes,
-                                int(headshot_crop['x']),
-                                int(headshot_crop['y']),
-                                int(headshot_crop['width']),
-                                int(headshot_crop['height'])
-                            )
-                        else:
-                            headshot_bytes = image_bytes
-
-                        # Upload headshot as avatar (for character thumbnail)
-                        avatar_info = op.upload_avatar(headshot_bytes, filename)
-                        avatar_upload_id = str(avatar_info.get('id', ''))
-
-                        # Upload full image as file (for bio embed)
-                        file_info = op.upload_image(image_bytes, filename)
-                        file_id = file_info.get('id')
-                        if file_id:
-                            image_embed = f'[[File:{file_id} | class=media-item-align-none | {filename}]]'
-                    except Exception as e:
-                        cherrypy.log(f'Failed to upload image for {name}: {e}')
-                        # Continue without image
-
-                response = op.create_character(
-                    name,
-                    summary=summary,
-                    tags=tags,
-                    description=public,
-                    bio=image_embed,
-                    gm_info=private,
-                    avatar_upload_id=avatar_upload_id
-                )
-
-                slug = name.lower().replace(' ', '-')
-                results.append({
-                    'success': True,
-                    'name': name,
-                    'view_url': config['campaign_url'] + '/characters/' + slug,
-                    'edit_url': config['campaign_url'] + '/characters/' + slug + '/edit',
-                    'error': None
-                })
-            except Exception as e:
-                cherrypy.log(f'Failed to upload {char_data.get("name", "unknown")}: {e}\n{traceback.format_exc()}')
-                results.append({
-                    'success': False,
-                    'name': char_data.get('name', 'Unknown'),
-                    'error': str(e)
-                })
+    @cherrypy.expose
+    @cherrypy.config(**{'response.stream': True})
+    def ministry_upload_stream(self):
+        """
+        This is like ministry_upload_bulk() but streams our progress as
+        newline-delimited JSON, one line per stage of each character as it
+        finishes (see UploadPipeline.upload_stream()), so the frontend can show
+        real progress and retry failures without waiting for the whole batch.
+        """
+        data = json.loads(cherrypy.request.body.read())
+        cherrypy.response.headers['Content-Type'] = 'application/x-ndjson'
+        cherrypy.response.headers['Cache-Control'] = 'no-cache'
+
+        def stream():
+            for event in upload_pipeline.upload_stream(data.get('characters', [])):
+                yield dumps(event) + b'\n'
+        return stream()
 
-        return {'results': results}
 
+# Anything precompiled from our config or constants (e.g. trait tables) is only
+# built once per process, so we restart when our config changes, just as the
+# autoreloader already does when any of our code changes.
+cherrypy.engine.autoreload.files.update(CONFIG_FILES)
 
-cherrypy.tree.mount(Root(), '/')
+# time every request to every endpoint; see the metrics module
+cherrypy.tree.mount(Root(), '/', {'/': {'tools.metrics.on': True}})